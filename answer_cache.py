@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+import math
+import time
+import random
+import threading
+from collections import OrderedDict
+
+from normalize import normalize_question
+
+# In-process answer cache, bounded in bytes
+ANSWER_CACHE_MAX_BYTES = int(os.environ.get("ANSWER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 86400))
+
+# Expired answers are still served for this long while one refresh runs
+ANSWER_CACHE_GRACE = float(os.environ.get("ANSWER_CACHE_GRACE", 600))
+# Higher beta refreshes earlier ahead of expiry; 0 disables early refresh
+ANSWER_CACHE_EARLY_BETA = float(os.environ.get("ANSWER_CACHE_EARLY_BETA", 1.0))
+# A claimed refresh that hasn't completed by then may be claimed again
+REFRESH_CLAIM_SECONDS = 60.0
+DEFAULT_COST = 1.0
+
+# Time-sensitive intents expire sooner than general shopping advice
+INTENT_TTLS = {
+    'pricing': float(os.environ.get("ANSWER_CACHE_TTL_PRICING", 900)),
+    'trends': float(os.environ.get("ANSWER_CACHE_TTL_TRENDS", 3600))
+}
+_INTENT_PATTERNS = {
+    'pricing': re.compile(r"\b(prices?|pricing|deals?|discounts?|sales?|coupons?|cheap|cheapest)\b"),
+    'trends': re.compile(r"\b(trends?|trending|latest|new)\b")
+}
+
+# Share of the byte budget given to the recency window and to protected entries
+WINDOW_RATIO = 0.01
+PROTECTED_RATIO = 0.8
+# Rough per-entry bookkeeping cost on top of the key and answer strings
+ENTRY_OVERHEAD = 200
+
+
+def ttl_for(question):
+    """Cache lifetime for a question's answer, based on its intent"""
+    normalized = normalize_question(question)
+    for intent, pattern in _INTENT_PATTERNS.items():
+        if pattern.search(normalized):
+            return INTENT_TTLS[intent]
+    return ANSWER_CACHE_TTL
+
+
+class FrequencySketch:
+    """Count-min sketch of recent access frequency with periodic aging.
+
+    Counters saturate at 15 and are all halved once sample_size accesses
+    have been recorded, so popularity fades when traffic moves on.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, sample_size):
+        width = 64
+        while width < sample_size:
+            width *= 2
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(self.DEPTH)]
+        self._sample_size = max(sample_size * 10, 1000)
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        for row in range(self.DEPTH):
+            yield row, (h ^ (h >> (row * 8 + 3)) ^ (row * 0x9E3779B1)) & self._mask
+
+    def increment(self, key):
+        for row, index in self._indexes(key):
+            if self._rows[row][index] < self.MAX_COUNT:
+                self._rows[row][index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def frequency(self, key):
+        return min(self._rows[row][index] for row, index in self._indexes(key))
+
+    def _age(self):
+        self._rows = [bytearray(count >> 1 for count in row) for row in self._rows]
+        self._additions //= 2
+
+
+class _Entry:
+    __slots__ = ('answer', 'size', 'expires', 'cost', 'refresh_claimed')
+
+    def __init__(self, answer, size, expires, cost):
+        self.answer = answer
+        self.size = size
+        self.expires = expires
+        self.cost = cost
+        self.refresh_claimed = None
+
+    def needs_refresh(self, now, beta):
+        """Past expiry, or randomly early in proportion to how long the answer took (XFetch)"""
+        if now >= self.expires:
+            return True
+        return beta > 0 and now - self.cost * beta * math.log(1.0 - random.random()) >= self.expires
+
+
+class AnswerCache:
+    """Thread-safe answer cache with W-TinyLFU admission and eviction.
+
+    New entries land in a small LRU window. Entries leaving the window
+    compete with the least recently used entry of the main segment and are
+    only admitted if the frequency sketch says they are asked more often,
+    so a burst of one-off questions can't flush the popular answers. The
+    main segment is a segmented LRU: entries hit again move from probation
+    to protected. All budgets are in bytes.
+
+    Expired entries stay for a grace period and are returned as stale so
+    the caller can serve them while it refreshes; claim_refresh makes sure
+    only one caller does.
+    """
+
+    def __init__(self, max_bytes=ANSWER_CACHE_MAX_BYTES, ttl=ANSWER_CACHE_TTL, grace=ANSWER_CACHE_GRACE,
+                 early_beta=ANSWER_CACHE_EARLY_BETA):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.grace = grace
+        self.early_beta = early_beta
+        self.window_max = max(int(max_bytes * WINDOW_RATIO), 1)
+        self.main_max = max_bytes - self.window_max
+        self.protected_max = int(self.main_max * PROTECTED_RATIO)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._lock = threading.Lock()
+        self._sketch = FrequencySketch(max(max_bytes // 1024, 64))
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._window_bytes = 0
+        self._probation_bytes = 0
+        self._protected_bytes = 0
+
+    def get(self, key):
+        """Return the cached answer for key (possibly stale), or None"""
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """Return (answer, stale) for key, or (None, False) on a miss"""
+        with self._lock:
+            self._sketch.increment(key)
+            segment, entry = self._find(key)
+            now = time.monotonic()
+            if entry is None or entry.expires + self.grace <= now:
+                if entry is not None:
+                    self._remove(segment, key)
+                self.misses += 1
+                return None, False
+            stale = entry.needs_refresh(now, self.early_beta)
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            if segment is self._probation:
+                self._promote(key, entry)
+            else:
+                segment.move_to_end(key)
+            return entry.answer, stale
+
+    def claim_refresh(self, key):
+        """True for the one caller that should refresh a stale entry"""
+        with self._lock:
+            _, entry = self._find(key)
+            now = time.monotonic()
+            if entry is None or (entry.refresh_claimed is not None
+                                 and now - entry.refresh_claimed < REFRESH_CLAIM_SECONDS):
+                return False
+            entry.refresh_claimed = now
+            self.refreshes += 1
+            return True
+
+    def set(self, key, answer, ttl=None, cost=DEFAULT_COST):
+        """Store an answer; it may later be rejected by the admission policy.
+
+        ttl may be zero or negative for an answer that is already stale.
+        cost is how long the answer took to produce, in seconds.
+        """
+        size = sys.getsizeof(key) + sys.getsizeof(answer) + ENTRY_OVERHEAD
+        entry = _Entry(answer, size, time.monotonic() + (self.ttl if ttl is None else ttl), cost)
+        with self._lock:
+            if size > self.main_max:
+                self.rejections += 1
+                return
+            segment, _ = self._find(key)
+            if segment is not None:
+                self._remove(segment, key)
+            self._window[key] = entry
+            self._window_bytes += size
+            # An answer larger than the whole window goes straight to admission
+            while self._window_bytes > self.window_max:
+                candidate_key, candidate = self._window.popitem(last=False)
+                self._window_bytes -= candidate.size
+                self._admit(candidate_key, candidate)
+
+    def _find(self, key):
+        for segment in (self._window, self._probation, self._protected):
+            entry = segment.get(key)
+            if entry is not None:
+                return segment, entry
+        return None, None
+
+    def _remove(self, segment, key):
+        entry = segment.pop(key)
+        if segment is self._window:
+            self._window_bytes -= entry.size
+        elif segment is self._probation:
+            self._probation_bytes -= entry.size
+        else:
+            self._protected_bytes -= entry.size
+
+    def _admit(self, key, entry):
+        """Move a window evictee into the main segment if it beats the victims it displaces"""
+        candidate_frequency = self._sketch.frequency(key)
+        while self._probation_bytes + self._protected_bytes + entry.size > self.main_max:
+            segment = self._probation if self._probation else self._protected
+            victim_key = next(iter(segment))
+            if candidate_frequency <= self._sketch.frequency(victim_key):
+                self.rejections += 1
+                return
+            self._remove(segment, victim_key)
+            self.evictions += 1
+        self._probation[key] = entry
+        self._probation_bytes += entry.size
+
+    def _promote(self, key, entry):
+        self._remove(self._probation, key)
+        self._protected[key] = entry
+        self._protected_bytes += entry.size
+        # Overflowing protected entries get another chance in probation
+        while self._protected_bytes > self.protected_max:
+            demoted_key, demoted = self._protected.popitem(last=False)
+            self._protected_bytes -= demoted.size
+            self._probation[demoted_key] = demoted
+            self._probation_bytes += demoted.size
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'entries': len(self._window) + len(self._probation) + len(self._protected),
+                'bytes': self._window_bytes + self._probation_bytes + self._protected_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'rejections': self.rejections
+            }
@@ -0,0 +1,140 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import threading
+
+from shared_cache import encode, decode
+
+
+# Answers kept on disk across restarts and deploys
+ANSWER_STORE_ENABLED = os.environ.get("ANSWER_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Unset = answers.db in the app's instance folder
+ANSWER_STORE_PATH = os.environ.get("ANSWER_STORE_PATH")
+ANSWER_STORE_PRELOAD = int(os.environ.get("ANSWER_STORE_PRELOAD", 5000))
+ANSWER_STORE_MAX_ENTRIES = int(os.environ.get("ANSWER_STORE_MAX_ENTRIES", 100000))
+
+# Expired rows and rows beyond max_entries are deleted once per this many writes
+PURGE_EVERY = 500
+
+
+class AnswerStore:
+    """SQLite file of compressed answers keyed like the answer cache.
+
+    Rows keep the original question so snapshots can be inspected and the
+    semantic index rebuilt, and a last_used time so the hottest entries can
+    be loaded into memory first on start-up. The file is purged on
+    start-up and every PURGE_EVERY writes, keeping at most max_entries of
+    the most recently used rows.
+    """
+
+    def __init__(self, path, enabled=ANSWER_STORE_ENABLED, max_entries=ANSWER_STORE_MAX_ENTRIES):
+        self.path = path
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        if not self.enabled:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, question TEXT NOT NULL, value BLOB NOT NULL, "
+                "expires REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self.purge()
+
+    def _connect(self):
+        # One connection per thread, reopened after fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return (answer, seconds_left) or None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires FROM answers WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+        return decode(row[0]), row[1] - now
+
+    def put(self, key, question, answer, ttl):
+        if not self.enabled:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, question, value, expires, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, question, encode(answer), now + ttl, now)
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def hot(self, limit):
+        """Yield (key, question, answer, seconds_left) for the most recently used live entries"""
+        if not self.enabled:
+            return
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT key, question, value, expires FROM answers WHERE expires > ? ORDER BY last_used DESC LIMIT ?",
+            (now, limit)
+        )
+        for key, question, value, expires in rows:
+            yield key, question, decode(value), expires - now
+
+    def purge(self):
+        """Delete expired entries, then the least recently used ones beyond max_entries"""
+        if not self.enabled:
+            return
+        conn = self._connect()
+        conn.execute("DELETE FROM answers WHERE expires <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def export_snapshot(self, path):
+        """Write live entries to a gzipped JSON-lines file; returns the count"""
+        count = 0
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for key, question, answer, ttl in self.hot(-1):
+                f.write(json.dumps({
+                    'key': key,
+                    'question': question,
+                    'answer': answer,
+                    'expires': time.time() + ttl
+                }) + "\n")
+                count += 1
+        return count
+
+    def import_snapshot(self, path):
+        """Load entries from a snapshot, skipping expired ones; returns the count"""
+        now = time.time()
+        rows = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry['expires'] > now:
+                    rows.append((entry['key'], entry['question'], encode(entry['answer']), entry['expires'], now))
+        conn = self._connect()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO answers (key, question, value, expires, last_used) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("COMMIT")
+        return len(rows)
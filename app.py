@@ -1,12 +1,44 @@
 import os
+import json
+import time
+import hashlib
+import asyncio
 import logging
-import requests
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+import threading
+import click
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, render_template, request, jsonify, flash, redirect, url_for, stream_with_context
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Local modules read their settings from the environment at import time
+import hf_client
+from normalize import normalize_question, question_key
+from singleflight import SingleFlight
+from batching import MicroBatcher
+from circuit_breaker import CircuitOpenError, get_breaker, breaker_states
+from deadlines import (DEADLINE_HEADER, Deadline, DeadlineExceeded, parse_deadline,
+                       get_latency_tracker, latency_snapshots, upstream_timeout)
+from model_loading import LOADING_MAX_RETRIES, get_loading_state, loading_estimate, loading_snapshots
+from warmup import WARMUP_ENABLED, WARMUP_GATE_HEALTH, WARMUP_TIMEOUT, ModelWarmer
+from providers import ProviderRouter, load_endpoints
+from limiter import AdaptiveLimiter, LimitExceeded
+from answer_cache import DEFAULT_COST, AnswerCache, ttl_for
+from semantic_cache import SemanticCache
+from shared_cache import SharedCache
+from answer_store import ANSWER_STORE_PATH, ANSWER_STORE_PRELOAD, AnswerStore
+from negative_cache import NegativeCache
+from planner import (EXACT, LLM, PLANNER_LLM_QUALITY, PLANNER_LOG_PATH, PLANNER_RETRIEVAL_SCORE, RETRIEVAL,
+                     SEMANTIC, Option, Planner)
+from demo_bank import DemoBank
+from retrieval import KNOWLEDGE_BASE_DIR, KNOWLEDGE_INDEX_PATH, KnowledgeIndex, Retriever, load_index
+from intents import IntentMatcher
+from intent_classifier import (INTENT_MODEL_PATH, INTENT_TRAINING_FILE, IntentClassifier, benchmark,
+                               load_classifier, load_training_data)
+from precompute import PRECOMPUTE_CONCURRENCY, PRECOMPUTE_FILE, collect_questions, precompute
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -15,19 +47,47 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 
-# Direct HuggingFace API implementation
-def call_huggingface_api(question):
-    """Call HuggingFace API directly for more reliable results"""
-    try:
-        api_key = os.getenv("HUGGINGFACE_API_KEY")
-        if not api_key:
-            raise Exception("HUGGINGFACE_API_KEY not found")
-        
-        # Use a reliable model that works well with the Inference API
-        model_id = "google/flan-t5-small"
-        
-        # Create the retail-focused prompt
-        prompt = f"""You are a helpful AI assistant specialized in retail and e-commerce. You provide accurate, helpful information about:
+def _instance_file(configured, name):
+    """The configured path when set, otherwise name in the app's instance folder"""
+    return configured if configured is not None else os.path.join(app.instance_path, name)
+
+# Files the app writes (answer store, trained models, decision log) are kept out of the working directory
+ANSWER_STORE_FILE = _instance_file(ANSWER_STORE_PATH, "answers.db")
+KNOWLEDGE_INDEX_FILE = _instance_file(KNOWLEDGE_INDEX_PATH, "knowledge_index.npz")
+INTENT_MODEL_FILE = _instance_file(INTENT_MODEL_PATH, "intent_model.npz")
+PLANNER_LOG_FILE = _instance_file(PLANNER_LOG_PATH, "planner_decisions.jsonl")
+
+# Upstream endpoints: HuggingFace models, dedicated endpoints or OpenAI-compatible servers
+router = ProviderRouter(load_endpoints())
+
+# Identifies the upstream pool in request keys (any endpoint may answer)
+UPSTREAM_ID = "+".join(router.names())
+
+# Generation settings sent with every prompt
+GENERATION_PARAMS = {
+    "max_new_tokens": 200,
+    "temperature": 0.7,
+    "return_full_text": False
+}
+
+# Past this budget the demo answer is served while the upstream call finishes in the background (0 = off)
+FALLBACK_BUDGET = float(os.environ.get("FALLBACK_BUDGET_MS", 2000)) / 1000
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 16))
+# Background upstream calls allowed to wait for a worker; beyond that requests are shed with a 503
+BACKGROUND_QUEUE_SIZE = int(os.environ.get("BACKGROUND_QUEUE_SIZE", 32))
+
+# Browser/CDN lifetime of GET /api/answer responses; fallback answers are kept only briefly
+ANSWER_HTTP_MAX_AGE = int(os.environ.get("ANSWER_HTTP_MAX_AGE", 300))
+FALLBACK_HTTP_MAX_AGE = int(os.environ.get("FALLBACK_HTTP_MAX_AGE", 30))
+
+NO_ANSWER_MESSAGE = "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
+
+# Bump whenever build_prompt changes so cached answers from the old prompt are not reused
+PROMPT_VERSION = "retail-1"
+
+def build_prompt(question):
+    """Create the retail-focused prompt"""
+    return f"""You are a helpful AI assistant specialized in retail and e-commerce. You provide accurate, helpful information about:
 - Product recommendations
 - Shopping advice  
 - Retail trends
@@ -41,158 +101,930 @@ def call_huggingface_api(question):
 Question: {question}
 
 Please provide a helpful, accurate, and detailed answer focused on retail and shopping:"""
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 200,
-                "temperature": 0.7,
-                "return_full_text": False
-            }
-        }
-        
-        # Try the basic inference endpoint first
-        response = requests.post(
-            f"https://api-inference.huggingface.co/models/{model_id}",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
-        
+
+class UpstreamAnswer(str):
+    """Answer text generated by an upstream model (the only kind worth caching)"""
+
+def generated_text_from(item):
+    """Extract the generated text from one upstream result entry"""
+    # Batched text-generation results nest one list per input
+    if isinstance(item, list):
+        item = item[0] if item else {}
+    generated_text = item.get('generated_text', '').strip() if isinstance(item, dict) else ''
+    return UpstreamAnswer(generated_text) if generated_text else NO_ANSWER_MESSAGE
+
+def error_answer(question, status_code):
+    """Pick the demo response matching an upstream error status"""
+    if status_code == 403:
+        # Handle insufficient permissions with helpful guidance
+        return get_demo_response(question, "insufficient_permissions")
+    elif status_code == 404:
+        # Handle model not found
+        return get_demo_response(question, "model_not_found")
+    else:
+        return get_demo_response(question, "api_error")
+
+def answer_from_response(question, response, endpoint):
+    """Turn an upstream HTTP response (requests or httpx) into an answer"""
+    if response.status_code == 200:
+        result = endpoint.results(response.json())
+        if isinstance(result, list) and len(result) > 0:
+            return generated_text_from(result[0])
+        return NO_ANSWER_MESSAGE
+    if response.status_code not in (403, 404):
+        logger.error(f"Upstream API error from {endpoint.name}: {response.status_code} - {response.text}")
+    return error_answer(question, response.status_code)
+
+def answers_from_batch_response(questions, response, endpoint):
+    """Turn a batched upstream response into one answer per question"""
+    if response.status_code == 200:
+        result = endpoint.results(response.json())
+        if isinstance(result, list) and len(result) == len(questions):
+            return [generated_text_from(item) for item in result]
+        logger.error(f"{endpoint.name} batch returned {len(result) if isinstance(result, list) else 'no'} results for {len(questions)} questions")
+        return [NO_ANSWER_MESSAGE for _ in questions]
+    if response.status_code not in (403, 404):
+        logger.error(f"Upstream API error from {endpoint.name}: {response.status_code} - {response.text}")
+    return [error_answer(question, response.status_code) for question in questions]
+
+# Endpoints that answered 403/404 are skipped for a while instead of retried on every request
+negative_cache = NegativeCache()
+
+def _endpoint_available(endpoint):
+    return (endpoint.configured() and not get_breaker(endpoint.name).is_open()
+            and negative_cache.blocked(endpoint.name) is None)
+
+def _endpoint_ready(endpoint):
+    return _endpoint_available(endpoint) and not get_loading_state(endpoint.name).loading
+
+def _upstream_available():
+    return any(_endpoint_available(endpoint) for endpoint in router.endpoints)
+
+def _unavailable_error_type():
+    """Demo-response variant to serve when no endpoint can be used"""
+    for endpoint in router.endpoints:
+        error_type = negative_cache.blocked(endpoint.name)
+        if error_type is not None:
+            return error_type
+    return "api_error"
+
+# Identical questions asked concurrently share one upstream call
+inflight = SingleFlight(result_types=(UpstreamAnswer,))
+
+# Caps concurrent upstream calls per process and sheds load beyond its queue
+limiter = AdaptiveLimiter()
+
+# Answers from upstream keyed on (normalized question, upstream, params, prompt version),
+# including ones that finished after their request fell back
+answer_cache = AnswerCache()
+
+# Second tier shared by every worker on the host (SQLite on tmpfs, or a Redis-compatible server)
+shared_cache = SharedCache()
+
+# On-disk copy of every answer, which survives restarts and deploys
+answer_store = AnswerStore(ANSWER_STORE_FILE)
+
+# Finds the answered question closest in meaning to a new one. The embedding model loads here,
+# once, so with gunicorn's preload_app the workers share it and no request waits for it
+semantic_cache = SemanticCache()
+semantic_cache.load()
+
+# BM25 index over the knowledge_base folder, rebuilt at start-up when the documents changed
+try:
+    retriever = Retriever(load_index(KNOWLEDGE_INDEX_FILE))
+except Exception as e:
+    logger.warning(f"Knowledge base unavailable: {e}")
+    retriever = Retriever()
+
+# Runs upstream calls that may outlive the request waiting on them
+_background = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="answer-fill")
+_pending_fills = {}
+_pending_fills_lock = threading.Lock()
+_pending_afills = {}
+
+def _within_fallback_budget(deadline):
+    """True when the request should simply wait for upstream (no fallback needed)"""
+    return FALLBACK_BUDGET <= 0 or deadline.remaining() <= FALLBACK_BUDGET
+
+def _exact_option(key, question):
+    answer, stale = _lookup_key(key)
+    if answer is None:
+        return Option(0.0, note="miss")
+    # Index answers other workers produced so near-duplicates match here too
+    semantic_cache.add(question, key)
+    return Option(1.0, (answer, stale), "stale" if stale else None)
+
+def _semantic_option(question):
+    similar_key, similarity = semantic_cache.nearest(question)
+    if similar_key is not None:
+        answer, _ = _lookup_key(similar_key)
+        if answer is not None:
+            # The cache's own threshold decides what matches; map [threshold, 1] onto [planner bar, 1]
+            threshold = min(semantic_cache.threshold, 0.999)
+            quality = planner.min_quality + (1 - planner.min_quality) * (similarity - threshold) / (1 - threshold)
+            return Option(min(1.0, max(planner.min_quality, quality)), answer, f"similarity {similarity:.3f}")
+    return Option(0.0, note="miss")
+
+def _retrieval_option(question):
+    coverage, score, answer = retriever.lookup(question)
+    if answer is None:
+        return Option(0.0, note="not covered")
+    # Coverage is 1.0 for nearly any one- or two-term question, so weak matches are rated down
+    return Option(coverage * min(1.0, score / PLANNER_RETRIEVAL_SCORE), answer,
+                  f"coverage {coverage:.2f}, score {score:.1f}")
+
+def _llm_option(deadline):
+    """The LLM's quality rating, or a note on why it can't answer this request"""
+    if not _upstream_available():
+        return Option(0.0, note="upstream_unavailable")
+    if deadline.expired():
+        return Option(0.0, note="deadline_expired")
+    if limiter.saturated():
+        return Option(0.0, note="limiter_full")
+    if _quota_left() == 0:
+        return Option(0.0, note="quota_exhausted")
+    return Option(PLANNER_LLM_QUALITY)
+
+def _quota_left():
+    """Rate-limit quota left across usable endpoints; None if any of them doesn't report one"""
+    quotas = [endpoint.quota_left() for endpoint in router.endpoints if _endpoint_available(endpoint)]
+    if not quotas or None in quotas:
+        return None
+    return sum(quotas)
+
+def _expected_upstream_ms():
+    """EWMA latency of the fastest usable endpoint, or None before any calls"""
+    latencies = [endpoint.ewma_latency for endpoint in router.endpoints
+                 if endpoint.ewma_latency is not None and _endpoint_available(endpoint)]
+    return round(min(latencies) * 1000, 1) if latencies else None
+
+def _plan(key, question, deadline):
+    """Decide whether the caches, the knowledge base, the demo bank or the LLM answers"""
+    expected_ms = _expected_upstream_ms()
+    return planner.plan(question, {
+        EXACT: lambda: _exact_option(key, question),
+        SEMANTIC: lambda: _semantic_option(question),
+        RETRIEVAL: lambda: _retrieval_option(question),
+        LLM: lambda: _llm_option(deadline)
+    }, costs={LLM: expected_ms} if expected_ms else None, signals={
+        'deadline_ms': round(deadline.remaining() * 1000),
+        'expected_upstream_ms': expected_ms,
+        'limiter_inflight': limiter.inflight,
+        'limiter_limit': round(limiter.limit, 1),
+        'quota_left': _quota_left()
+    })
+
+def _planned_answer(decision, key, question, refresh):
+    """The answer for any decision but the LLM; refresh(key, question, deadline) renews a stale exact hit"""
+    if decision.source == EXACT:
+        answer, stale = decision.value
+        # Serve the stale answer now and refresh it in the background
+        if _should_refresh(key, stale):
+            try:
+                refresh(key, question, Deadline.default())
+            except LimitExceeded:
+                logger.debug("Background queue full, skipping refresh of a stale answer")
+        return answer
+    return _local_answer(decision, question)
+
+def _local_answer(decision, question):
+    """The answer for a decision that doesn't call upstream"""
+    if decision.source == SEMANTIC:
+        return decision.value
+    llm = decision.options.get(LLM)
+    if llm is None:
+        # A cheaper source was good enough, so the LLM was never considered
+        return decision.value if decision.source == RETRIEVAL else demo_bank.response(question, "api_error")
+    error_type = _unavailable_error_type() if llm.note == "upstream_unavailable" else "api_error"
+    if decision.source == RETRIEVAL:
+        return decision.value + demo_bank.guidance(error_type)
+    return demo_bank.response(question, error_type)
+
+def _lookup_key(key):
+    """Look a key up in this worker's cache, then the shared tier, then the disk store"""
+    answer, stale = answer_cache.lookup(key)
+    if answer is not None:
+        return answer, stale
+    shared = shared_cache.get(key)
+    if shared is None:
+        shared = answer_store.get(key)
+        if shared is None:
+            return None, False
+        shared_cache.set(key, *shared)
+    answer, ttl = shared
+    answer = UpstreamAnswer(answer)
+    # The outer tiers keep answers through the grace period too
+    fresh_ttl = ttl - answer_cache.grace
+    answer_cache.set(key, answer, ttl=fresh_ttl)
+    return answer, fresh_ttl <= 0
+
+def _fill_cache(key, question, answer, cost=DEFAULT_COST):
+    if isinstance(answer, UpstreamAnswer):
+        ttl = ttl_for(question)
+        answer_cache.set(key, answer, ttl=ttl, cost=cost)
+        shared_cache.set(key, answer, ttl + answer_cache.grace)
+        answer_store.put(key, question, answer, ttl + answer_cache.grace)
+        semantic_cache.add(question, key)
+    return answer
+
+def _should_refresh(key, stale):
+    """Claim the single background refresh for a stale answer"""
+    return stale and _upstream_available() and answer_cache.claim_refresh(key)
+
+def call_huggingface_api(question, deadline=None):
+    """Answer a question from the cheapest good-enough source, calling upstream within its deadline"""
+    deadline = deadline or Deadline.default()
+    key = question_key(question, UPSTREAM_ID, GENERATION_PARAMS, PROMPT_VERSION)
+    decision = _plan(key, question, deadline)
+    if decision.source != LLM:
+        return _planned_answer(decision, key, question, _background_answer)
+    try:
+        if _within_fallback_budget(deadline):
+            return _answer(key, question, deadline)
+        return _background_answer(key, question, deadline).result(timeout=FALLBACK_BUDGET)
+    except TimeoutError:
+        logger.warning("No upstream answer within budget, serving demo response")
+        return get_demo_response(question, "api_error")
+
+def _answer(key, question, deadline):
+    start = time.monotonic()
+    if batcher.enabled:
+        answer = inflight.do(key, lambda: batcher.submit((question, deadline), timeout=deadline.remaining()),
+                             timeout=deadline.remaining())
+    else:
+        answer = inflight.do(key, lambda: _call_huggingface_api(question, deadline), timeout=deadline.remaining())
+    return _fill_cache(key, question, answer, time.monotonic() - start)
+
+def refresh_answer(question):
+    """Make sure a fresh answer for question is cached; returns cached, filled or failed"""
+    key = question_key(question, UPSTREAM_ID, GENERATION_PARAMS, PROMPT_VERSION)
+    cached, stale = _lookup_key(key)
+    if cached is not None and not stale:
+        return "cached"
+    if not _upstream_available():
+        return "failed"
+    answer = _answer(key, question, Deadline.default())
+    return "filled" if isinstance(answer, UpstreamAnswer) else "failed"
+
+def _background_answer(key, question, deadline):
+    """Start (or join) a background upstream call for key; it fills the cache when done"""
+    with _pending_fills_lock:
+        future = _pending_fills.get(key)
+        if future is not None:
+            return future
+        # Bounded, or the bulkhead would only ever see BACKGROUND_WORKERS callers
+        if len(_pending_fills) >= BACKGROUND_WORKERS + BACKGROUND_QUEUE_SIZE:
+            limiter.reject("Background answer queue full")
+        future = _pending_fills[key] = _background.submit(_answer, key, question, deadline)
+    # Outside the lock: the callback runs inline if the call has already finished
+    future.add_done_callback(lambda done: _finish_fill(key, done))
+    return future
+
+def _finish_fill(key, future):
+    with _pending_fills_lock:
+        _pending_fills.pop(key, None)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"Background answer failed: {future.exception()}")
+
+async def call_huggingface_api_async(question, deadline=None):
+    """Async variant of call_huggingface_api used by the ASGI serving mode"""
+    deadline = deadline or Deadline.default()
+    key = question_key(question, UPSTREAM_ID, GENERATION_PARAMS, PROMPT_VERSION)
+    # Embedding is CPU-bound, keep it off the event loop
+    decision = await asyncio.to_thread(_plan, key, question, deadline)
+    if decision.source != LLM:
+        return _planned_answer(decision, key, question, _abackground_answer)
+    try:
+        if _within_fallback_budget(deadline):
+            return await _aanswer(key, question, deadline)
+        return await asyncio.wait_for(asyncio.shield(_abackground_answer(key, question, deadline)), FALLBACK_BUDGET)
+    except (TimeoutError, asyncio.TimeoutError):
+        logger.warning("No upstream answer within budget, serving demo response")
+        return get_demo_response(question, "api_error")
+
+async def _aanswer(key, question, deadline):
+    start = time.monotonic()
+    if batcher.enabled:
+        answer = await inflight.ado(key, lambda: batcher.asubmit((question, deadline), timeout=deadline.remaining()),
+                                    timeout=deadline.remaining())
+    else:
+        answer = await inflight.ado(key, lambda: _call_huggingface_api_async(question, deadline),
+                                    timeout=deadline.remaining())
+    return await asyncio.to_thread(_fill_cache, key, question, answer, time.monotonic() - start)
+
+def _abackground_answer(key, question, deadline):
+    """Async variant of _background_answer; the task is kept alive until it finishes"""
+    task = _pending_afills.get(key)
+    if task is None:
+        if len(_pending_afills) >= BACKGROUND_WORKERS + BACKGROUND_QUEUE_SIZE:
+            limiter.reject("Background answer queue full")
+        task = _pending_afills[key] = asyncio.ensure_future(_aanswer(key, question, deadline))
+        task.add_done_callback(lambda done: _finish_afill(key, done))
+    return task
+
+def _finish_afill(key, task):
+    _pending_afills.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background answer failed: {task.exception()}")
+
+def _send_upstream(endpoint, payload, deadline):
+    """Make one upstream attempt, recording the outcome on the breaker and latency tracker"""
+    if not endpoint.configured():
+        raise Exception(f"{endpoint.api_key_env} not found")
+
+    breaker = get_breaker(endpoint.name)
+    latency = get_latency_tracker(endpoint.name)
+    # Timeout comes from the remaining budget and observed upstream latency
+    timeout = upstream_timeout(deadline, latency)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit breaker open for {endpoint.name}")
+    slot = _admit(breaker, deadline)
+
+    start = time.monotonic()
+    try:
+        # Pooled keep-alive session
+        response = hf_client.post(endpoint.url, payload, timeout=min(timeout, deadline.remaining()),
+                                  headers=endpoint.headers)
+    except Exception:
+        slot.dropped = True
+        limiter.release(slot)
+        breaker.record_failure(time.monotonic() - start)
+        endpoint.record(time.monotonic() - start, False)
+        raise
+    _release_slot(slot, response)
+    return _record_attempt(endpoint, response, time.monotonic() - start, breaker, latency)
+
+async def _asend_upstream(endpoint, payload, deadline):
+    """Async variant of _send_upstream"""
+    if not endpoint.configured():
+        raise Exception(f"{endpoint.api_key_env} not found")
+
+    breaker = get_breaker(endpoint.name)
+    latency = get_latency_tracker(endpoint.name)
+    timeout = upstream_timeout(deadline, latency)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit breaker open for {endpoint.name}")
+    slot = await _aadmit(breaker, deadline)
+
+    start = time.monotonic()
+    try:
+        response = await hf_client.apost(endpoint.url, payload, timeout=min(timeout, deadline.remaining()),
+                                         headers=endpoint.headers)
+    except Exception:
+        slot.dropped = True
+        limiter.release(slot)
+        breaker.record_failure(time.monotonic() - start)
+        endpoint.record(time.monotonic() - start, False)
+        raise
+    _release_slot(slot, response)
+    return _record_attempt(endpoint, response, time.monotonic() - start, breaker, latency)
+
+def _admit(breaker, deadline):
+    """Take a bulkhead slot for an attempt that already holds a breaker permit"""
+    try:
+        slot = limiter.acquire(deadline.remaining())
+    except LimitExceeded:
+        breaker.release()
+        raise
+    if deadline.expired():
+        # The budget ran out while queued
+        slot.skip = True
+        limiter.release(slot)
+        breaker.release()
+        raise DeadlineExceeded("Request deadline exceeded while queued for upstream")
+    return slot
+
+async def _aadmit(breaker, deadline):
+    """Async variant of _admit"""
+    try:
+        slot = await limiter.aacquire(deadline.remaining())
+    except LimitExceeded:
+        breaker.release()
+        raise
+    if deadline.expired():
+        slot.skip = True
+        limiter.release(slot)
+        breaker.release()
+        raise DeadlineExceeded("Request deadline exceeded while queued for upstream")
+    return slot
+
+def _release_slot(slot, response):
+    """Upstream 429s shrink the limit; 503s (model loading, outages) aren't latency samples"""
+    slot.dropped = response.status_code == 429
+    slot.skip = response.status_code == 503
+    limiter.release(slot)
+
+def _record_attempt(endpoint, response, elapsed, breaker, latency):
+    """Return (response, loading estimate); a cold-loading model is not an endpoint failure"""
+    estimate = loading_estimate(response)
+    if estimate is None:
+        breaker.record_response(response.status_code, elapsed)
+        latency.record(elapsed)
+        endpoint.record(elapsed, response.status_code < 500 and response.status_code != 429)
+        negative_cache.record(endpoint.name, response.status_code)
+        endpoint.record_quota(response.status_code, response.headers)
         if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                generated_text = result[0].get('generated_text', '').strip()
-                if generated_text:
-                    return generated_text
-                else:
-                    return "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
-            else:
-                return "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
-        elif response.status_code == 403:
-            # Handle insufficient permissions with helpful guidance
-            return get_demo_response(question, "insufficient_permissions")
-        elif response.status_code == 404:
-            # Handle model not found
-            return get_demo_response(question, "model_not_found")
-        else:
-            logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
-            return get_demo_response(question, "api_error")
-            
+            warmer.touch(endpoint.name)
+    else:
+        breaker.release()
+        warmer.mark_cold(endpoint.name)
+    return response, estimate
+
+def _post_endpoint(endpoint, payload, deadline):
+    """POST to one endpoint, retrying while HuggingFace loads the model"""
+    loading = get_loading_state(endpoint.name)
+    attempt = 0
+    while True:
+        # Wait out a shared loading estimate instead of polling upstream ourselves
+        wait = loading.next_wait(attempt)
+        while wait > 0:
+            if wait >= deadline.remaining():
+                raise DeadlineExceeded(f"Model {endpoint.name} still loading at request deadline")
+            loading.wait(wait)
+            attempt += 1
+            wait = loading.next_wait(attempt)
+
+        try:
+            response, estimate = _send_upstream(endpoint, payload, deadline)
+        except Exception:
+            loading.abandon_poll()
+            raise
+        if estimate is None:
+            loading.mark_ready()
+            return response
+        loading.mark_loading(estimate)
+        attempt += 1
+        if attempt > LOADING_MAX_RETRIES:
+            return response
+
+async def _apost_endpoint(endpoint, payload, deadline):
+    """Async variant of _post_endpoint"""
+    loading = get_loading_state(endpoint.name)
+    attempt = 0
+    while True:
+        wait = loading.next_wait(attempt)
+        while wait > 0:
+            if wait >= deadline.remaining():
+                raise DeadlineExceeded(f"Model {endpoint.name} still loading at request deadline")
+            await loading.await_wait(wait)
+            attempt += 1
+            wait = loading.next_wait(attempt)
+
+        try:
+            response, estimate = await _asend_upstream(endpoint, payload, deadline)
+        except Exception:
+            loading.abandon_poll()
+            raise
+        if estimate is None:
+            loading.mark_ready()
+            return response
+        loading.mark_loading(estimate)
+        attempt += 1
+        if attempt > LOADING_MAX_RETRIES:
+            return response
+
+def _choose_endpoint(tried):
+    """Prefer healthy endpoints whose model is loaded, then any healthy one"""
+    endpoint = router.choose(_endpoint_ready, exclude=tried) or router.choose(_endpoint_available, exclude=tried)
+    if endpoint is None:
+        raise CircuitOpenError("No healthy upstream endpoint")
+    return endpoint
+
+def _post_upstream(prompts, deadline):
+    """Route one prompt or a batch of prompts upstream; returns (endpoint, response)"""
+    tried = set()
+    while True:
+        endpoint = _choose_endpoint(tried)
+        try:
+            return endpoint, _post_endpoint(endpoint, endpoint.build_payload(prompts, GENERATION_PARAMS), deadline)
+        except CircuitOpenError:
+            # Its half-open breaker had no probe slot left; try another endpoint
+            tried.add(endpoint.name)
+
+async def _apost_upstream(prompts, deadline):
+    """Async variant of _post_upstream"""
+    tried = set()
+    while True:
+        endpoint = _choose_endpoint(tried)
+        try:
+            return endpoint, await _apost_endpoint(endpoint, endpoint.build_payload(prompts, GENERATION_PARAMS), deadline)
+        except CircuitOpenError:
+            tried.add(endpoint.name)
+
+# Out of budget, breakers open or upstream timed out: degrade to the demo answer
+DEGRADED_ERRORS = (CircuitOpenError, DeadlineExceeded) + hf_client.TIMEOUT_ERRORS
+
+# Direct upstream API implementation
+def _call_huggingface_api(question, deadline):
+    """Call the upstream API directly for more reliable results"""
+    try:
+        endpoint, response = _post_upstream(build_prompt(question), deadline)
+        return answer_from_response(question, response, endpoint)
+    
+    except DEGRADED_ERRORS:
+        return get_demo_response(question, "api_error")
+    except LimitExceeded:
+        # Shed requests surface to the route as 503 + Retry-After
+        raise
+    except Exception as e:
+        logger.error(f"Error calling upstream API: {str(e)}")
+        return f"I encountered an error: {str(e)}. Please try again."
+
+async def _call_huggingface_api_async(question, deadline):
+    """Call the upstream API through the async client"""
+    try:
+        endpoint, response = await _apost_upstream(build_prompt(question), deadline)
+        return answer_from_response(question, response, endpoint)
+    
+    except DEGRADED_ERRORS:
+        return get_demo_response(question, "api_error")
+    except LimitExceeded:
+        # Shed requests surface to the route as 503 + Retry-After
+        raise
     except Exception as e:
-        logger.error(f"Error calling HuggingFace API: {str(e)}")
+        logger.error(f"Error calling upstream API: {str(e)}")
         return f"I encountered an error: {str(e)}. Please try again."
 
+def _loosest_deadline(deadlines):
+    """A batch may run as long as its most patient member allows"""
+    return max(deadlines, key=lambda deadline: deadline.remaining())
+
+def _call_huggingface_api_batch(items):
+    """Send several (question, deadline) items upstream in one inference request"""
+    questions = [question for question, _ in items]
+    try:
+        deadline = _loosest_deadline([deadline for _, deadline in items])
+        endpoint, response = _post_upstream([build_prompt(question) for question in questions], deadline)
+        return answers_from_batch_response(questions, response, endpoint)
+    
+    except DEGRADED_ERRORS:
+        return [get_demo_response(question, "api_error") for question in questions]
+    except LimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error calling upstream API: {str(e)}")
+        return [f"I encountered an error: {str(e)}. Please try again." for _ in questions]
+
+async def _call_huggingface_api_batch_async(items):
+    """Async variant of _call_huggingface_api_batch"""
+    questions = [question for question, _ in items]
+    try:
+        deadline = _loosest_deadline([deadline for _, deadline in items])
+        endpoint, response = await _apost_upstream([build_prompt(question) for question in questions], deadline)
+        return answers_from_batch_response(questions, response, endpoint)
+    
+    except DEGRADED_ERRORS:
+        return [get_demo_response(question, "api_error") for question in questions]
+    except LimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error calling upstream API: {str(e)}")
+        return [f"I encountered an error: {str(e)}. Please try again." for _ in questions]
+
+# Questions arriving within HF_BATCH_WINDOW_MS share one inference request
+batcher = MicroBatcher(_call_huggingface_api_batch, _call_huggingface_api_batch_async)
+
+# Time to first token and total stream time, reported separately
+stream_ttft = get_latency_tracker("stream:ttft")
+stream_total = get_latency_tracker("stream:total")
+
+def format_sse(event, data):
+    """Serialize one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _is_event_stream(response):
+    return response.status_code == 200 and response.headers.get("content-type", "").startswith("text/event-stream")
+
+def _streamed_answer(parts):
+    """The assembled answer; an UpstreamAnswer only if every part came from the model"""
+    answer = "".join(parts).strip()
+    if answer and all(isinstance(part, UpstreamAnswer) for part in parts):
+        return UpstreamAnswer(answer)
+    return answer
+
+def _stream_done_event(answer, start, first_token_at, source):
+    total = time.monotonic() - start
+    stream_total.record(total)
+    return format_sse("done", {
+        'answer': answer,
+        'source': source,
+        'cached': source in (EXACT, SEMANTIC),
+        'ttft_ms': round((first_token_at - start) * 1000, 1) if first_token_at else None,
+        'total_ms': round(total * 1000, 1)
+    })
+
+def stream_answer(question, deadline=None):
+    """Yield SSE token events as the upstream generates the answer, then a done event.
+
+    Like call_huggingface_api the planner picks the source first; anything
+    but the LLM is sent as a single token, and a streamed model answer is
+    cached once it is complete.
+    """
+    deadline = deadline or Deadline.default()
+    start = time.monotonic()
+    key = question_key(question, UPSTREAM_ID, GENERATION_PARAMS, PROMPT_VERSION)
+    decision = _plan(key, question, deadline)
+    if decision.source != LLM:
+        chunks = [_planned_answer(decision, key, question, _background_answer)]
+    else:
+        chunks = _stream_tokens(question, deadline)
+    first_token_at = None
+    parts = []
+    for text in chunks:
+        if first_token_at is None:
+            first_token_at = time.monotonic()
+            stream_ttft.record(first_token_at - start)
+        parts.append(text)
+        yield format_sse("token", {'text': text})
+    answer = _streamed_answer(parts)
+    if decision.source == LLM:
+        _fill_cache(key, question, answer, time.monotonic() - start)
+    yield _stream_done_event(answer, start, first_token_at, decision.source)
+
+async def astream_answer(question, deadline=None):
+    """Async variant of stream_answer used by the ASGI serving mode"""
+    deadline = deadline or Deadline.default()
+    start = time.monotonic()
+    key = question_key(question, UPSTREAM_ID, GENERATION_PARAMS, PROMPT_VERSION)
+    decision = await asyncio.to_thread(_plan, key, question, deadline)
+    first_token_at = None
+    parts = []
+    if decision.source != LLM:
+        answer = _planned_answer(decision, key, question, _abackground_answer)
+        first_token_at = time.monotonic()
+        stream_ttft.record(first_token_at - start)
+        parts.append(answer)
+        yield format_sse("token", {'text': answer})
+    else:
+        async for text in _astream_tokens(question, deadline):
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+                stream_ttft.record(first_token_at - start)
+            parts.append(text)
+            yield format_sse("token", {'text': text})
+    answer = _streamed_answer(parts)
+    if decision.source == LLM:
+        await asyncio.to_thread(_fill_cache, key, question, answer, time.monotonic() - start)
+    yield _stream_done_event(answer, start, first_token_at, decision.source)
+
+def _open_stream(deadline):
+    """Pick an endpoint and reserve a breaker slot for a streamed call"""
+    endpoint = _choose_endpoint(set())
+    if not endpoint.configured():
+        raise Exception(f"{endpoint.api_key_env} not found")
+    breaker = get_breaker(endpoint.name)
+    latency = get_latency_tracker(endpoint.name)
+    timeout = upstream_timeout(deadline, latency)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Circuit breaker open for {endpoint.name}")
+    return endpoint, breaker, latency, timeout
+
+def _stream_tokens(question, deadline):
+    """Yield answer text chunks from a streaming upstream call"""
+    if not _upstream_available() or deadline.expired():
+        yield get_demo_response(question, _unavailable_error_type())
+        return
+    try:
+        endpoint, breaker, latency, timeout = _open_stream(deadline)
+        slot = _admit(breaker, deadline)
+        payload = endpoint.build_stream_payload(build_prompt(question), GENERATION_PARAMS)
+        start = time.monotonic()
+        try:
+            response = hf_client.stream_post(endpoint.url, payload, timeout=timeout, headers=endpoint.headers)
+        except Exception:
+            slot.dropped = True
+            limiter.release(slot)
+            breaker.record_failure(time.monotonic() - start)
+            endpoint.record(time.monotonic() - start, False)
+            raise
+    except DEGRADED_ERRORS + (LimitExceeded,):
+        yield get_demo_response(question, "api_error")
+        return
+    except Exception as e:
+        logger.error(f"Error calling upstream API: {str(e)}")
+        yield f"I encountered an error: {str(e)}. Please try again."
+        return
+
+    # The slot is held for the whole stream but sampled at time to first token
+    tokens = 0
+    try:
+        with response:
+            endpoint.record_quota(response.status_code, response.headers)
+            if not _is_event_stream(response):
+                # The model doesn't stream (or upstream errored): send the whole answer at once
+                _release_slot(slot, response)
+                slot = None
+                _record_attempt(endpoint, response, time.monotonic() - start, breaker, latency)
+                yield answer_from_response(question, response, endpoint)
+                return
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                text = endpoint.token_from_event(line[5:].strip())
+                if not text:
+                    continue
+                if tokens == 0:
+                    # The breaker judges streams by time to first token
+                    slot.latency = time.monotonic() - start
+                    breaker.record_response(200, slot.latency)
+                    endpoint.record(slot.latency, True)
+                tokens += 1
+                yield UpstreamAnswer(text)
+    except Exception as e:
+        logger.error(f"Stream from {endpoint.name} interrupted: {str(e)}")
+        if slot is not None:
+            slot.dropped = tokens == 0
+        if tokens == 0:
+            breaker.record_failure(time.monotonic() - start)
+            endpoint.record(time.monotonic() - start, False)
+            yield get_demo_response(question, "api_error")
+        return
+    finally:
+        if slot is not None:
+            limiter.release(slot)
+    if tokens == 0:
+        breaker.record_response(200, time.monotonic() - start)
+        yield NO_ANSWER_MESSAGE
+
+async def _astream_tokens(question, deadline):
+    """Async variant of _stream_tokens"""
+    if not _upstream_available() or deadline.expired():
+        yield get_demo_response(question, _unavailable_error_type())
+        return
+    try:
+        endpoint, breaker, latency, timeout = _open_stream(deadline)
+        slot = await _aadmit(breaker, deadline)
+    except DEGRADED_ERRORS + (LimitExceeded,):
+        yield get_demo_response(question, "api_error")
+        return
+    except Exception as e:
+        logger.error(f"Error calling upstream API: {str(e)}")
+        yield f"I encountered an error: {str(e)}. Please try again."
+        return
+
+    payload = endpoint.build_stream_payload(build_prompt(question), GENERATION_PARAMS)
+    start = time.monotonic()
+    tokens = 0
+    try:
+        async with hf_client.astream_post(endpoint.url, payload, timeout=timeout, headers=endpoint.headers) as response:
+            endpoint.record_quota(response.status_code, response.headers)
+            if not _is_event_stream(response):
+                await response.aread()
+                _release_slot(slot, response)
+                slot = None
+                _record_attempt(endpoint, response, time.monotonic() - start, breaker, latency)
+                yield answer_from_response(question, response, endpoint)
+                return
+
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                text = endpoint.token_from_event(line[5:].strip())
+                if not text:
+                    continue
+                if tokens == 0:
+                    slot.latency = time.monotonic() - start
+                    breaker.record_response(200, slot.latency)
+                    endpoint.record(slot.latency, True)
+                tokens += 1
+                yield UpstreamAnswer(text)
+    except Exception as e:
+        logger.error(f"Stream from {endpoint.name} interrupted: {str(e)}")
+        if slot is not None:
+            slot.dropped = tokens == 0
+        if tokens == 0:
+            breaker.record_failure(time.monotonic() - start)
+            endpoint.record(time.monotonic() - start, False)
+            yield get_demo_response(question, "api_error")
+        return
+    finally:
+        if slot is not None:
+            limiter.release(slot)
+    if tokens == 0:
+        breaker.record_response(200, time.monotonic() - start)
+        yield NO_ANSWER_MESSAGE
+
 # Test API availability
 def test_api():
     """Test if the API is working"""
     try:
-        api_key = os.getenv("HUGGINGFACE_API_KEY")
-        return bool(api_key)
+        return any(endpoint.configured() for endpoint in router.endpoints)
     except:
         return False
 
 api_available = test_api()
 
-def get_demo_response(question, error_type):
-    """Generate intelligent demo responses based on the question"""
-    question_lower = question.lower()
-    
-    # Retail trends responses
-    if any(word in question_lower for word in ['trend', 'trending', 'popular', 'latest', 'new']):
-        demo_answer = """**Current Retail Trends:**
-• Sustainable and eco-friendly products are driving consumer choices
-• Omnichannel experiences combining online and in-store shopping
-• AI-powered personalization and recommendation systems
-• Social commerce through Instagram, TikTok, and influencer partnerships
-• Buy-now-pay-later payment options becoming standard
-• Voice commerce and smart home integration
-• Subscription-based retail models expanding"""
-    
-    # Shopping advice responses
-    elif any(word in question_lower for word in ['deal', 'save', 'discount', 'cheap', 'best price']):
-        demo_answer = """**Money-Saving Shopping Tips:**
-• Compare prices across multiple retailers before buying
-• Sign up for store newsletters to get exclusive discounts
-• Use cashback apps and browser extensions
-• Shop during major sale events (Black Friday, end-of-season sales)
-• Check for price-match policies at major retailers
-• Consider buying generic or store brands for basics
-• Use loyalty programs and accumulate points"""
-    
-    # Product recommendations
-    elif any(word in question_lower for word in ['recommend', 'suggest', 'best', 'review']):
-        demo_answer = """**Product Research Tips:**
-• Read customer reviews on multiple platforms
-• Check professional review sites for detailed comparisons
-• Consider your specific needs and budget constraints
-• Look for products with good warranty and return policies
-• Research brand reputation and customer service quality
-• Compare features vs. price across similar products
-• Ask for recommendations from friends and online communities"""
-    
-    # Returns and customer service
-    elif any(word in question_lower for word in ['return', 'exchange', 'refund', 'customer service']):
-        demo_answer = """**Return and Exchange Guidelines:**
-• Always keep receipts and original packaging
-• Check return policies before purchasing (timeframes vary)
-• Many retailers offer 30-90 day return windows
-• Online purchases often have longer return periods
-• Some items (electronics, clothing) may have restocking fees
-• Contact customer service for damaged or defective items
-• Consider extended warranties for expensive electronics"""
-    
-    # Online shopping
-    elif any(word in question_lower for word in ['online', 'ecommerce', 'internet', 'website']):
-        demo_answer = """**Safe Online Shopping Practices:**
-• Shop only on secure websites (look for HTTPS)
-• Use secure payment methods (credit cards, PayPal)
-• Read seller reviews and ratings carefully
-• Check shipping costs and delivery timeframes
-• Save confirmation emails and tracking information
-• Be cautious of deals that seem too good to be true
-• Use strong passwords and enable two-factor authentication"""
-    
-    # General retail question
-    else:
-        demo_answer = """**General Retail Insights:**
-• The retail industry is rapidly evolving with technology
-• Customer experience is becoming more important than price alone
-• Mobile shopping continues to grow significantly
-• Sustainability is increasingly important to consumers
-• Local and small businesses are finding new ways to compete
-• Data analytics help retailers understand customer preferences
-• The line between online and offline shopping continues to blur"""
-    
-    # Add error-specific guidance
-    if error_type == "insufficient_permissions":
-        guidance = """
-
-**⚠️ API Limitation Notice:**
-Your HuggingFace API key has limited permissions. For full AI-powered responses:
-• Upgrade to HuggingFace Pro ($9/month) at huggingface.co/pricing
-• Or provide an OpenAI API key for even better responses"""
-    elif error_type == "model_not_found":
-        guidance = """
-
-**⚠️ Model Access Issue:**
-The AI model is temporarily unavailable. For full functionality:
-• Try upgrading your HuggingFace account permissions
-• Or I can modify this app to use OpenAI's API instead"""
-    else:
-        guidance = """
+def _warm_model(name):
+    """Send a cheap inference so the model is loaded before real users arrive"""
+    endpoint = router.get(name)
+    payload = endpoint.build_payload("Hello", {"max_new_tokens": 1, "return_full_text": False})
+    response = _post_endpoint(endpoint, payload, Deadline(WARMUP_TIMEOUT))
+    if response.status_code >= 500 or loading_estimate(response) is not None:
+        return False
+    return True
 
-**⚠️ API Connection Issue:**
-There's a temporary issue with the AI service. For full functionality:
-• Check your internet connection
-• Or consider upgrading to a more reliable AI service"""
-    
-    return demo_answer + guidance
+# Warm the models at boot and keep them warm; gunicorn.conf.py restarts this after fork
+warmer = ModelWarmer(_warm_model, [endpoint.name for endpoint in router.endpoints if endpoint.configured()],
+                     enabled=WARMUP_ENABLED and api_available)
+warmer.ensure_started()
+
+def preload_answers(limit=ANSWER_STORE_PRELOAD):
+    """Load the most recently used stored answers into memory"""
+    count = 0
+    for key, question, answer, ttl in answer_store.hot(limit):
+        answer_cache.set(key, UpstreamAnswer(answer), ttl=ttl - answer_cache.grace)
+        count += 1
+    if count:
+        logger.info(f"Preloaded {count} cached answers from {answer_store.path}")
+    return count
+
+# With gunicorn's preload_app this runs once in the master and workers inherit the warm cache
+preload_answers()
+
+@app.cli.command("export-answers")
+@click.argument("path")
+def export_answers_command(path):
+    """Write every live stored answer to a gzipped JSON-lines snapshot"""
+    count = answer_store.export_snapshot(path)
+    click.echo(f"Exported {count} answers to {path}")
+
+@app.cli.command("import-answers")
+@click.argument("path")
+def import_answers_command(path):
+    """Load a snapshot written by export-answers into the answer store"""
+    count = answer_store.import_snapshot(path)
+    click.echo(f"Imported {count} answers from {path}")
+
+@app.cli.command("precompute-answers")
+@click.option("--file", "question_file", default=PRECOMPUTE_FILE, help="Extra questions, one per line")
+@click.option("--concurrency", default=PRECOMPUTE_CONCURRENCY, show_default=True, help="Parallel upstream calls")
+@click.option("--every", type=float, default=0, help="Repeat every N seconds (0 = run once)")
+def precompute_answers_command(question_file, concurrency, every):
+    """Cache answers for the example questions in index.html and an optional question file.
+
+    Answers land in the shared cache and the answer store, where the
+    running workers pick them up.
+    """
+    questions = collect_questions(os.path.join(app.root_path, "index.html"), question_file)
+    while True:
+        counts = precompute(questions, refresh_answer, concurrency)
+        click.echo(f"{len(questions)} questions: {counts['filled']} filled, "
+                   f"{counts['cached']} already fresh, {counts['failed']} failed")
+        if every <= 0:
+            return
+        time.sleep(every)
+
+@app.cli.command("build-knowledge-index")
+@click.option("--source", default=KNOWLEDGE_BASE_DIR, show_default=True, help="Folder of .md/.txt documents")
+@click.option("--output", default=KNOWLEDGE_INDEX_FILE, show_default=True, help="Where to write the index")
+def build_knowledge_index_command(source, output):
+    """Rebuild the BM25 index used for offline answers"""
+    index = KnowledgeIndex.build(source)
+    index.save(output)
+    click.echo(f"Indexed {len(index)} passages ({len(index.vocabulary)} terms) from {source} into {output}")
+
+@app.cli.command("train-intents")
+@click.option("--data", default=INTENT_TRAINING_FILE, show_default=True, help="question<TAB>intent training file")
+@click.option("--output", default=INTENT_MODEL_FILE, show_default=True, help="Where to write the model")
+def train_intents_command(data, output):
+    """Train the intent classifier used to pick fallback answers"""
+    questions, labels = load_training_data(data)
+    classifier = IntentClassifier.train(questions, labels)
+    classifier.save(output)
+    accuracy = sum(predicted == label for predicted, label in
+                   zip(classifier.predict(questions), labels)) / len(labels)
+    click.echo(f"Trained on {len(questions)} questions ({len(classifier.classes)} intents), "
+               f"training accuracy {accuracy:.2f}, saved to {output}")
+
+@app.cli.command("benchmark-intents")
+@click.option("--data", default=INTENT_TRAINING_FILE, show_default=True, help="Questions to time (intents are ignored)")
+@click.option("--model", default=INTENT_MODEL_FILE, show_default=True, help="Trained model to time")
+@click.option("--repeat", default=20, show_default=True)
+def benchmark_intents_command(data, model, repeat):
+    """Compare keyword matching with the trained classifier"""
+    classifier = load_classifier(model)
+    if classifier is None:
+        raise click.ClickException(f"No intent model at {model}; run flask train-intents first")
+    questions, _ = load_training_data(data)
+    results = benchmark(IntentMatcher(), classifier, questions, repeat)
+    click.echo(json.dumps(results, indent=2))
+
+# Fallback answers from answer_bank.json, pre-rendered per intent and error type and
+# reloaded when the file changes. Intents come from the trained classifier when a
+# model exists, otherwise from keyword matching.
+intent_classifier = load_classifier(INTENT_MODEL_FILE)
+demo_bank = DemoBank(matcher=intent_classifier)
+
+# Routes each question to the cheapest answer source that is good enough, logging every decision
+planner = Planner(demo_bank.matcher.best, log_path=PLANNER_LOG_FILE)
+
+def get_demo_response(question, error_type):
+    """Answer from the knowledge base when it covers the question, otherwise from the demo bank"""
+    grounded = retriever.answer(question)
+    if grounded is not None:
+        return grounded + demo_bank.guidance(error_type)
+    return demo_bank.response(question, error_type)
 
 # API is ready to use
 
@@ -220,7 +1052,12 @@ def ask_question():
         logger.info(f"Processing question: {question}")
         
         # Generate response using direct HuggingFace API
-        response = call_huggingface_api(question)
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), request.form.get('deadline_ms'))
+        try:
+            response = call_huggingface_api(question, deadline)
+        except LimitExceeded as e:
+            flash(f'The assistant is busy right now. Please try again in {e.retry_after} seconds.', 'warning')
+            return redirect(url_for('index'))
         
         logger.info("Response generated successfully")
         
@@ -251,7 +1088,8 @@ def api_ask_question():
         logger.info(f"API processing question: {question}")
         
         # Generate response using direct HuggingFace API
-        response = call_huggingface_api(question)
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), data.get('deadline_ms'))
+        response = call_huggingface_api(question, deadline)
         
         return jsonify({
             'question': question,
@@ -259,6 +1097,76 @@ def api_ask_question():
             'success': True
         })
         
+    except LimitExceeded as e:
+        logger.warning(f"Shedding API request: {str(e)}")
+        return jsonify({'error': 'The AI service is busy, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/api/answer', methods=['GET'])
+def api_answer():
+    """Cacheable GET variant of /api/ask with ETag and Cache-Control headers"""
+    try:
+        question = normalize_question(request.args.get('q', ''))
+        if not question:
+            return jsonify({'error': 'Please provide a question'}), 400
+
+        # One URL per canonical question so edge caches don't store duplicates. Temporary and
+        # briefly cacheable, so a change to normalization isn't pinned in browsers forever
+        if request.args.get('q') != question or len(request.args) > 1:
+            response = redirect(url_for('api_answer', q=question), 302)
+            response.headers['Cache-Control'] = f"public, max-age={ANSWER_HTTP_MAX_AGE}"
+            return response
+
+        if not api_available:
+            return jsonify({'error': 'AI service is currently unavailable'}), 503
+
+        answer = call_huggingface_api(question, parse_deadline(request.headers.get(DEADLINE_HEADER), None))
+        response = jsonify({
+            'question': question,
+            'answer': answer,
+            'success': True
+        })
+        response.set_etag(hashlib.sha256(f"{answer}\0{UPSTREAM_ID}\0{PROMPT_VERSION}".encode("utf-8")).hexdigest())
+        if isinstance(answer, UpstreamAnswer):
+            max_age = min(ANSWER_HTTP_MAX_AGE, int(ttl_for(question)))
+            response.headers['Cache-Control'] = (f"public, max-age={max_age}, "
+                                                 f"stale-while-revalidate={int(answer_cache.grace)}")
+        else:
+            response.headers['Cache-Control'] = f"public, max-age={FALLBACK_HTTP_MAX_AGE}"
+        # Answers 304 Not Modified when If-None-Match matches
+        return response.make_conditional(request)
+
+    except LimitExceeded as e:
+        logger.warning(f"Shedding API request: {str(e)}")
+        return jsonify({'error': 'The AI service is busy, please retry shortly'}), 503, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/api/ask/stream', methods=['POST'])
+def api_ask_stream():
+    """Stream the answer token by token as server-sent events"""
+    try:
+        data = request.get_json()
+        question = data.get('question', '').strip()
+        
+        if not question:
+            return jsonify({'error': 'Please provide a question'}), 400
+        
+        if not api_available:
+            return jsonify({'error': 'AI service is currently unavailable'}), 503
+        
+        logger.info(f"API streaming question: {question}")
+        
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), data.get('deadline_ms'))
+        return Response(
+            stream_with_context(stream_answer(question, deadline)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
     except Exception as e:
         logger.error(f"API error: {str(e)}")
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -266,11 +1174,33 @@ def api_ask_question():
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    breakers = breaker_states()
+    ready = warmer.all_ready()
+    # Only the start-up warm-up holds traffic back; a model going cold later just degrades
+    warming = WARMUP_GATE_HEALTH and not warmer.attempted()
+    degraded = not ready or any(breaker['state'] != 'closed' for breaker in breakers.values())
     status = {
-        'status': 'healthy',
+        'status': 'warming' if warming else 'degraded' if degraded else 'healthy',
         'llm_available': api_available,
-        'api_key_configured': bool(os.getenv("HUGGINGFACE_API_KEY"))
+        'api_key_configured': bool(os.getenv("HUGGINGFACE_API_KEY")),
+        'circuit_breakers': breakers,
+        'upstream_latency': latency_snapshots(),
+        'model_loading': loading_snapshots(),
+        'providers': router.snapshot(),
+        'limiter': limiter.snapshot(),
+        'answer_cache': answer_cache.stats(),
+        'semantic_cache': semantic_cache.stats(),
+        'shared_cache': shared_cache.stats(),
+        'negative_cache': negative_cache.snapshot(),
+        'retrieval': retriever.stats(),
+        'answer_bank': demo_bank.stats(),
+        'planner': planner.stats(),
+        'ready': ready,
+        'models': warmer.snapshot()
     }
+    # Keep load balancers away until the models have had their first warm-up
+    if warming:
+        return jsonify(status), 503
     return jsonify(status)
 
 if __name__ == '__main__':
@@ -0,0 +1,93 @@
+import logging
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+# Importing app first loads .env before the other local modules read it
+from app import app as flask_app, api_available, astream_answer, call_huggingface_api_async
+import hf_client
+from deadlines import DEADLINE_HEADER, parse_deadline
+from limiter import LimitExceeded
+
+# ASGI serving mode:
+#   uvicorn asgi:app --workers 4
+#   gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+# /api/ask and /api/ask/stream run natively on the event loop so one worker
+# can hold many in-flight upstream calls; every other route is served by the
+# Flask app.
+
+logger = logging.getLogger(__name__)
+
+async def api_ask_question(request):
+    """Async API endpoint for AJAX requests"""
+    try:
+        data = await request.json()
+        question = data.get('question', '').strip()
+
+        if not question:
+            return JSONResponse({'error': 'Please provide a question'}, status_code=400)
+
+        if not api_available:
+            return JSONResponse({'error': 'AI service is currently unavailable'}, status_code=503)
+
+        logger.info(f"API processing question: {question}")
+
+        # Generate response using the async HuggingFace client
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), data.get('deadline_ms'))
+        response = await call_huggingface_api_async(question, deadline)
+
+        return JSONResponse({
+            'question': question,
+            'answer': response,
+            'success': True
+        })
+
+    except LimitExceeded as e:
+        logger.warning(f"Shedding API request: {str(e)}")
+        return JSONResponse({'error': 'The AI service is busy, please retry shortly'}, status_code=503,
+                            headers={'Retry-After': str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        return JSONResponse({'error': f'An error occurred: {str(e)}'}, status_code=500)
+
+async def api_ask_stream(request):
+    """Stream the answer token by token as server-sent events"""
+    try:
+        data = await request.json()
+        question = data.get('question', '').strip()
+
+        if not question:
+            return JSONResponse({'error': 'Please provide a question'}, status_code=400)
+
+        if not api_available:
+            return JSONResponse({'error': 'AI service is currently unavailable'}, status_code=503)
+
+        logger.info(f"API streaming question: {question}")
+
+        deadline = parse_deadline(request.headers.get(DEADLINE_HEADER), data.get('deadline_ms'))
+        return StreamingResponse(
+            astream_answer(question, deadline),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except Exception as e:
+        logger.error(f"API error: {str(e)}")
+        return JSONResponse({'error': f'An error occurred: {str(e)}'}, status_code=500)
+
+@asynccontextmanager
+async def lifespan(_app):
+    """Close the upstream connection pool on shutdown"""
+    yield
+    await hf_client.aclose_async_client()
+
+app = Starlette(
+    routes=[
+        Route('/api/ask', api_ask_question, methods=['POST']),
+        Route('/api/ask/stream', api_ask_stream, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan
+)
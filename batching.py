@@ -0,0 +1,122 @@
+import os
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Collect questions for up to BATCH_WINDOW_MS (0 disables batching)
+BATCH_WINDOW_MS = float(os.environ.get("HF_BATCH_WINDOW_MS", 0))
+BATCH_MAX_SIZE = int(os.environ.get("HF_BATCH_MAX_SIZE", 8))
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.results = None
+        self.error = None
+        self.flushed = False
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Group items submitted within a short window into one batched call.
+
+    send_batch(items) must return one result per item, in order. The batch
+    is flushed when the window elapses or when it reaches max_size, and each
+    waiting caller receives the result at its own position.
+    """
+
+    def __init__(self, send_batch, asend_batch=None, window_ms=BATCH_WINDOW_MS, max_size=BATCH_MAX_SIZE):
+        self.send_batch = send_batch
+        self.asend_batch = asend_batch
+        self.window = window_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self.batches_sent = 0
+        self.items_sent = 0
+        self._lock = threading.Lock()
+        self._pending = None
+        self._async_pending = None
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def submit(self, item, timeout=None):
+        """Add an item to the current batch and block until its result is ready"""
+        flush_now = False
+        with self._lock:
+            batch = self._pending
+            if batch is None:
+                batch = self._pending = _Batch()
+                timer = threading.Timer(self.window, self._flush, args=(batch,))
+                timer.daemon = True
+                timer.start()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_size:
+                self._pending = None
+                flush_now = True
+
+        if flush_now:
+            self._flush(batch)
+        if not batch.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched call")
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _flush(self, batch):
+        with self._lock:
+            if batch.flushed:
+                return
+            batch.flushed = True
+            if self._pending is batch:
+                self._pending = None
+
+        try:
+            batch.results = self._checked(batch.items, self.send_batch(batch.items))
+        except Exception as e:
+            logger.error(f"Batched call failed: {str(e)}")
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    async def asubmit(self, item, timeout=None):
+        """Async variant of submit for the ASGI serving mode"""
+        loop = asyncio.get_running_loop()
+        batch = self._async_pending
+        if batch is None:
+            batch = self._async_pending = []
+            loop.call_later(self.window, self._aflush_soon, batch)
+        future = loop.create_future()
+        batch.append((item, future))
+        if len(batch) >= self.max_size:
+            self._aflush_soon(batch)
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def _aflush_soon(self, batch):
+        if self._async_pending is batch:
+            self._async_pending = None
+            asyncio.ensure_future(self._aflush(batch))
+
+    async def _aflush(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            results = self._checked(items, await self.asend_batch(items))
+        except Exception as e:
+            logger.error(f"Batched call failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _checked(self, items, results):
+        if len(results) != len(items):
+            raise ValueError(f"Batch returned {len(results)} results for {len(items)} items")
+        self.batches_sent += 1
+        self.items_sent += len(items)
+        return results
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Breaker tuning
+CB_FAILURE_RATE = float(os.environ.get("CB_FAILURE_RATE", 0.5))
+CB_SLOW_CALL_SECONDS = float(os.environ.get("CB_SLOW_CALL_SECONDS", 10))
+CB_WINDOW_SECONDS = float(os.environ.get("CB_WINDOW_SECONDS", 30))
+CB_MIN_CALLS = int(os.environ.get("CB_MIN_CALLS", 5))
+CB_OPEN_SECONDS = float(os.environ.get("CB_OPEN_SECONDS", 15))
+CB_HALF_OPEN_PROBES = int(os.environ.get("CB_HALF_OPEN_PROBES", 1))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the breaker is open"""
+
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker for one upstream endpoint.
+
+    Calls that fail, return 5xx/429, or take longer than slow_call_seconds
+    count as failures. Once the failure rate over the rolling window crosses
+    failure_rate the breaker opens and rejects calls for open_seconds, then
+    lets a few probe calls through (half-open) to decide whether to close.
+    """
+
+    def __init__(self, name, failure_rate=CB_FAILURE_RATE, slow_call_seconds=CB_SLOW_CALL_SECONDS,
+                 window_seconds=CB_WINDOW_SECONDS, min_calls=CB_MIN_CALLS,
+                 open_seconds=CB_OPEN_SECONDS, half_open_probes=CB_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.rejected = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._avg_latency = None
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def is_open(self):
+        """Cheap check used to skip straight to the fallback answer"""
+        return self.state == OPEN
+
+    def allow_request(self):
+        """Reserve permission for one upstream call"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Give back a half-open probe slot without recording an outcome"""
+        with self._lock:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_response(self, status_code, latency):
+        """Record an upstream HTTP response"""
+        failed = status_code >= 500 or status_code == 429
+        self._record(not failed, latency)
+
+    def record_failure(self, latency):
+        """Record an upstream call that raised (timeout, connection error)"""
+        self._record(False, latency)
+
+    def _record(self, ok, latency):
+        ok = ok and latency < self.slow_call_seconds
+        with self._lock:
+            self._avg_latency = latency if self._avg_latency is None else 0.8 * self._avg_latency + 0.2 * latency
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if ok:
+                    logger.info(f"Circuit breaker {self.name} closed after successful probe")
+                    self._state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._trip()
+                return
+            if state == OPEN:
+                return
+
+            now = time.monotonic()
+            self._calls.append((now, ok))
+            self._prune(now)
+            failures = sum(1 for _, call_ok in self._calls if not call_ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+                self._trip()
+
+    def _trip(self):
+        logger.warning(f"Circuit breaker {self.name} opened")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._calls.clear()
+        self.times_opened += 1
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def snapshot(self):
+        """State summary for the health endpoint"""
+        with self._lock:
+            state = self._current_state()
+            self._prune(time.monotonic())
+            calls = len(self._calls)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            return {
+                'state': state,
+                'recent_calls': calls,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'avg_latency_ms': round(self._avg_latency * 1000, 1) if self._avg_latency is not None else None,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Return the breaker for an endpoint, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states():
+    """Snapshot of every breaker, keyed by endpoint name"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
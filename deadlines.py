@@ -0,0 +1,125 @@
+import os
+import time
+import threading
+from collections import deque
+
+# Client budget: X-Deadline-Ms header or deadline_ms field, else the default
+DEFAULT_DEADLINE_MS = float(os.environ.get("DEFAULT_DEADLINE_MS", 30000))
+MAX_DEADLINE_MS = float(os.environ.get("MAX_DEADLINE_MS", 60000))
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# Upstream timeout = clamp(percentile latency * multiplier, min, max), capped by the budget
+TIMEOUT_PERCENTILE = float(os.environ.get("UPSTREAM_TIMEOUT_PERCENTILE", 99))
+TIMEOUT_MULTIPLIER = float(os.environ.get("UPSTREAM_TIMEOUT_MULTIPLIER", 1.5))
+MIN_UPSTREAM_TIMEOUT = float(os.environ.get("MIN_UPSTREAM_TIMEOUT", 2))
+MAX_UPSTREAM_TIMEOUT = float(os.environ.get("MAX_UPSTREAM_TIMEOUT", 30))
+LATENCY_WINDOW = int(os.environ.get("UPSTREAM_LATENCY_WINDOW", 200))
+LATENCY_MIN_SAMPLES = 20
+
+# Don't start an upstream call with less budget than this
+MIN_USEFUL_BUDGET = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's budget runs out before it gets an answer"""
+
+
+class Deadline:
+    """Absolute point in time by which a request must be answered"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def default(cls):
+        return cls(DEFAULT_DEADLINE_MS / 1000.0)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() < MIN_USEFUL_BUDGET
+
+
+def parse_deadline(header_value=None, field_value=None):
+    """Build a request deadline from the header or API field, else the default"""
+    for value in (header_value, field_value):
+        if value in (None, ""):
+            continue
+        try:
+            budget_ms = float(value)
+        except (TypeError, ValueError):
+            continue
+        if budget_ms > 0:
+            return Deadline(min(budget_ms, MAX_DEADLINE_MS) / 1000.0)
+    return Deadline.default()
+
+
+class LatencyTracker:
+    """Rolling window of recent upstream latencies (seconds)"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, p, min_samples=LATENCY_MIN_SAMPLES):
+        """Latency at percentile p, or None until enough samples are in"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return _at_percentile(ordered, p)
+
+    def snapshot(self):
+        """Percentiles in milliseconds for the health endpoint"""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return {'samples': 0}
+        return {
+            'samples': len(ordered),
+            'p50_ms': round(_at_percentile(ordered, 50) * 1000, 1),
+            'p95_ms': round(_at_percentile(ordered, 95) * 1000, 1),
+            'p99_ms': round(_at_percentile(ordered, 99) * 1000, 1)
+        }
+
+
+def _at_percentile(ordered, p):
+    index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(name):
+    """Return the latency tracker for an endpoint, creating it on first use"""
+    with _trackers_lock:
+        tracker = _trackers.get(name)
+        if tracker is None:
+            tracker = _trackers[name] = LatencyTracker()
+        return tracker
+
+
+def latency_snapshots():
+    """Latency percentiles of every endpoint, keyed by endpoint name"""
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {name: tracker.snapshot() for name, tracker in trackers.items()}
+
+
+def upstream_timeout(deadline, tracker):
+    """Timeout for the next upstream call given the budget and observed latency"""
+    remaining = deadline.remaining()
+    if remaining < MIN_USEFUL_BUDGET:
+        raise DeadlineExceeded("Request deadline exceeded before calling upstream")
+    observed = tracker.percentile(TIMEOUT_PERCENTILE)
+    if observed is None:
+        return min(remaining, MAX_UPSTREAM_TIMEOUT)
+    adaptive = max(MIN_UPSTREAM_TIMEOUT, observed * TIMEOUT_MULTIPLIER)
+    return min(remaining, adaptive, MAX_UPSTREAM_TIMEOUT)
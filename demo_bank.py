@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+import threading
+from functools import lru_cache
+
+from intents import GENERAL, IntentMatcher
+
+logger = logging.getLogger(__name__)
+
+API_ERROR = "api_error"
+
+# Fallback answers and guidance notes, editable without a redeploy
+ANSWER_BANK_PATH = os.environ.get(
+    "ANSWER_BANK_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "answer_bank.json"))
+# How often a request may stat the file to pick up edits (0 = never reload)
+ANSWER_BANK_CHECK_INTERVAL = float(os.environ.get("ANSWER_BANK_CHECK_INTERVAL", 5))
+
+# Outage traffic repeats the same few questions; remember their rendered answers
+RESPONSE_MEMO_SIZE = 4096
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def load_bank(path=ANSWER_BANK_PATH):
+    """(version, answers, guidance) from a bank file, validated"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    answers, guidance = data["answers"], data["guidance"]
+    if GENERAL not in answers:
+        raise ValueError(f"{path} has no '{GENERAL}' answer")
+    if API_ERROR not in guidance:
+        raise ValueError(f"{path} has no '{API_ERROR}' guidance")
+    return data.get("version", 0), answers, guidance
+
+
+class _Bank:
+    """One immutable version of the bank with every (intent, error type) answer rendered"""
+
+    def __init__(self, version, answers, guidance, matcher):
+        self.version = version
+        self.guidance = dict(guidance)
+        self.rendered = {
+            (intent, error_type): answer + note
+            for intent, answer in answers.items()
+            for error_type, note in guidance.items()
+        }
+        self.matcher = matcher
+        self.response = lru_cache(maxsize=RESPONSE_MEMO_SIZE)(self._response)
+
+    def _response(self, question, error_type):
+        """The fallback answer for a question's top intent plus the guidance for error_type"""
+        if error_type not in self.guidance:
+            error_type = API_ERROR
+        intent = self.matcher.best(question)
+        if (intent, error_type) not in self.rendered:
+            intent = GENERAL
+        return self.rendered[(intent, error_type)]
+
+
+class DemoBank:
+    """Fallback answers loaded from a versioned JSON file and reloaded when it changes.
+
+    A reload builds a complete new bank and swaps it in with a single
+    assignment, so requests see either the old answers or the new ones and
+    never a mix. A file that fails to parse or validate is logged and the
+    current bank is kept.
+    """
+
+    def __init__(self, path=ANSWER_BANK_PATH, matcher=None, check_interval=ANSWER_BANK_CHECK_INTERVAL):
+        self.path = path
+        self.matcher = matcher or IntentMatcher()
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._signature = _file_signature(path)
+        self._bank = _Bank(*load_bank(path), self.matcher)
+        self._next_check = time.monotonic() + check_interval
+
+    @property
+    def version(self):
+        return self._bank.version
+
+    def response(self, question, error_type):
+        self._maybe_reload()
+        return self._bank.response(question, error_type)
+
+    def guidance(self, error_type):
+        """The note appended to fallback answers for an upstream error type"""
+        self._maybe_reload()
+        guidance = self._bank.guidance
+        return guidance.get(error_type, guidance[API_ERROR])
+
+    def _maybe_reload(self):
+        if self.check_interval <= 0 or time.monotonic() < self._next_check:
+            return
+        # One request checks; the rest carry on with the current bank
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            self.reload()
+        finally:
+            self._reload_lock.release()
+
+    def reload(self, force=False):
+        """Swap in the file's contents if it changed; True when a new bank was loaded"""
+        try:
+            signature = _file_signature(self.path)
+        except OSError as e:
+            logger.warning(f"Keeping answer bank version {self._bank.version}: {e}")
+            return False
+        if signature == self._signature and not force:
+            return False
+        # Remembered even if the file is bad, so a broken edit is reported once
+        self._signature = signature
+        try:
+            bank = _Bank(*load_bank(self.path), self.matcher)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Keeping answer bank version {self._bank.version}, could not load {self.path}: {e}")
+            return False
+        self._bank = bank
+        logger.info(f"Loaded answer bank version {bank.version} from {self.path}")
+        return True
+
+    def stats(self):
+        return {
+            'version': self._bank.version,
+            'path': self.path,
+            'intents': len({intent for intent, _ in self._bank.rendered}),
+            'memo': self._bank.response.cache_info()._asdict()
+        }
@@ -0,0 +1,16 @@
+# Gunicorn settings picked up automatically from the working directory
+
+# Import the app once in the master so workers share its preloaded answer cache
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Background threads don't survive fork, so restart them in each worker"""
+    from app import warmer
+    warmer.ensure_started()
+
+
+def when_ready(server):
+    """Workers do the warming; stop the thread the preloaded app started in the master"""
+    from app import warmer
+    warmer.stop()
@@ -0,0 +1,120 @@
+import os
+import time
+import logging
+import asyncio
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Upstream connection settings
+HF_API_BASE = os.environ.get("HUGGINGFACE_API_BASE", "https://api-inference.huggingface.co")
+POOL_SIZE = int(os.environ.get("HF_POOL_SIZE", 10))
+POOL_IDLE_TIMEOUT = float(os.environ.get("HF_POOL_IDLE_TIMEOUT", 60))
+ASYNC_POOL_SIZE = int(os.environ.get("HF_ASYNC_POOL_SIZE", 200))
+
+# Exceptions raised when an upstream call runs out of time
+TIMEOUT_ERRORS = (requests.Timeout, httpx.TimeoutException)
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+_last_used = 0.0
+_async_client = None
+_async_client_loop = None
+
+
+def _create_session():
+    """Create a keep-alive session with a bounded connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Auth headers are per endpoint and passed with each request
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+def get_session():
+    """Return the per-worker pooled session.
+
+    The session is rebuilt after a fork (so gunicorn workers never share
+    sockets with the master) and after the pool has sat idle longer than
+    POOL_IDLE_TIMEOUT, since upstream load balancers drop idle keep-alive
+    connections and the first request on a dead socket would fail.
+    """
+    global _session, _session_pid, _last_used
+    with _lock:
+        now = time.monotonic()
+        pid = os.getpid()
+        stale = _session is not None and now - _last_used > POOL_IDLE_TIMEOUT
+        if _session is None or _session_pid != pid or stale:
+            if _session is not None and _session_pid == pid:
+                _session.close()
+            logger.debug(f"Opening HuggingFace connection pool (size={POOL_SIZE}, pid={pid})")
+            _session = _create_session()
+            _session_pid = pid
+        _last_used = now
+        return _session
+
+
+def close_session():
+    """Close the pooled session, e.g. on worker shutdown or key rotation"""
+    global _session, _session_pid
+    with _lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def post(url, payload, timeout, headers=None):
+    """POST a JSON payload to an upstream endpoint over the pooled session"""
+    return get_session().post(url, json=payload, timeout=timeout, headers=headers)
+
+
+def stream_post(url, payload, timeout, headers=None):
+    """POST over the pooled session without reading the body (for SSE)"""
+    return get_session().post(url, json=payload, timeout=timeout, headers=headers, stream=True)
+
+
+def get_async_client():
+    """Return the httpx client bound to the running event loop.
+
+    One client (and pool) is kept per worker loop; the async pool is much
+    larger than the sync one because a single ASGI worker can hold hundreds
+    of in-flight upstream calls.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop or _async_client.is_closed:
+        limits = httpx.Limits(
+            max_connections=ASYNC_POOL_SIZE,
+            max_keepalive_connections=ASYNC_POOL_SIZE,
+            keepalive_expiry=POOL_IDLE_TIMEOUT
+        )
+        logger.debug(f"Opening async HuggingFace connection pool (size={ASYNC_POOL_SIZE})")
+        _async_client = httpx.AsyncClient(headers={"Content-Type": "application/json"}, limits=limits)
+        _async_client_loop = loop
+    return _async_client
+
+
+async def aclose_async_client():
+    """Close the async client, called from the ASGI lifespan shutdown"""
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+async def apost(url, payload, timeout, headers=None):
+    """Async POST of a JSON payload to an upstream endpoint"""
+    return await get_async_client().post(url, json=payload, timeout=timeout, headers=headers)
+
+
+def astream_post(url, payload, timeout, headers=None):
+    """Async context manager for a streamed POST (for SSE)"""
+    return get_async_client().stream("POST", url, json=payload, timeout=timeout, headers=headers)
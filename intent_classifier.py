@@ -0,0 +1,215 @@
+import os
+import math
+import time
+import zlib
+import logging
+from functools import lru_cache
+
+import numpy as np
+
+from intents import GENERAL, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Trained with `flask train-intents`; the keyword matcher is used until a model exists
+# Unset = intent_model.npz in the app's instance folder
+INTENT_MODEL_PATH = os.environ.get("INTENT_MODEL_PATH")
+INTENT_TRAINING_FILE = os.environ.get(
+    "INTENT_TRAINING_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_training.tsv"))
+# Below this top probability, or this lead over the runner-up, a question gets the general answer
+INTENT_MIN_CONFIDENCE = float(os.environ.get("INTENT_MIN_CONFIDENCE", 0.3))
+INTENT_MIN_MARGIN = float(os.environ.get("INTENT_MIN_MARGIN", 0.1))
+
+HASH_BITS = 14
+TRAIN_EPOCHS = 300
+LEARNING_RATE = 2.0
+L2_PENALTY = 1e-4
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_index(feature, mask):
+    return zlib.crc32(feature.encode("utf-8")) & mask
+
+
+def feature_counts(question, mask):
+    """Hashed counts of the question's words and word pairs"""
+    words = tokenize(question)
+    counts = {}
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        index = _feature_index(feature, mask)
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def load_training_data(path=INTENT_TRAINING_FILE):
+    """(questions, labels) from a question<TAB>intent file; # lines are comments"""
+    questions, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            question, intent = line.rstrip("\n").rsplit("\t", 1)
+            questions.append(question)
+            labels.append(intent.strip())
+    return questions, labels
+
+
+class IntentClassifier:
+    """Softmax regression over TF-IDF weighted, hashed word n-grams.
+
+    The whole model is four NumPy arrays (class names, idf, weights, bias).
+    A single question costs a handful of hash lookups and one small gather;
+    a batch is flattened into one sparse matrix and scored in a single
+    vectorized pass. best() only trusts a clear winner: off-topic or
+    gibberish questions spread their probability thinly and get GENERAL.
+    """
+
+    def __init__(self, classes, idf, weights, bias, min_confidence=INTENT_MIN_CONFIDENCE,
+                 min_margin=INTENT_MIN_MARGIN):
+        self.classes = [str(name) for name in classes]
+        self.idf = idf.astype(np.float32)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self._mask = len(self.idf) - 1
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["classes"], data["idf"], data["weights"], data["bias"])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, classes=np.array(self.classes), idf=self.idf, weights=self.weights, bias=self.bias)
+
+    def _vectorize(self, questions):
+        """Row-flattened sparse TF-IDF matrix: (row ids, feature ids, values)"""
+        rows, columns, values = [], [], []
+        for row, question in enumerate(questions):
+            for index, count in feature_counts(question, self._mask).items():
+                rows.append(row)
+                columns.append(index)
+                values.append(1.0 + math.log(count))
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        values = np.array(values, dtype=np.float32) * self.idf[columns]
+        norms = np.bincount(rows, weights=values * values, minlength=len(questions))
+        values /= np.sqrt(np.maximum(norms, 1e-12)).astype(np.float32)[rows]
+        return rows, columns, values
+
+    def _logits(self, count, rows, columns, values, weights, bias):
+        """bias + X @ weights for the sparse rows, summed per row in one pass"""
+        logits = np.tile(bias, (count, 1))
+        if len(rows):
+            # rows are sorted, so each question's features are one contiguous run
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            logits[rows[starts]] += np.add.reduceat(weights[columns] * values[:, None], starts, axis=0)
+        return logits
+
+    def decision_function(self, questions):
+        """Class scores for a batch of questions, shape (len(questions), classes)"""
+        rows, columns, values = self._vectorize(questions)
+        return self._logits(len(questions), rows, columns, values, self.weights, self.bias)
+
+    def predict(self, questions):
+        """best() for every question in a batch, in one vectorized pass"""
+        if not questions:
+            return []
+        rows, columns, values = self._vectorize(questions)
+        logits = self._logits(len(questions), rows, columns, values, self.weights, self.bias)
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        top = np.argmax(probabilities, axis=1)
+        ranked = np.sort(probabilities, axis=1)
+        best = ranked[:, -1]
+        runner_up = ranked[:, -2] if len(self.classes) > 1 else np.zeros(len(questions))
+        # Questions without a single known word have no features at all
+        unsure = ((best < self.min_confidence) | (best - runner_up < self.min_margin)
+                  | (np.bincount(rows, minlength=len(questions)) == 0))
+        return [GENERAL if unsure[row] else self.classes[index] for row, index in enumerate(top)]
+
+    def scores(self, question):
+        """[(intent, probability)] for one question, best first"""
+        counts = feature_counts(question, self._mask)
+        if not counts:
+            return [(GENERAL, 1.0)] if GENERAL in self.classes else []
+        columns = list(counts)
+        values = self.idf[columns] * [1.0 + math.log(count) for count in counts.values()]
+        logits = self.bias + (values @ self.weights[columns]) / math.sqrt(values @ values)
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        return sorted(zip(self.classes, probabilities.tolist()), key=lambda item: -item[1])
+
+    def best(self, question):
+        """The top intent, or GENERAL when it isn't a confident, clear winner"""
+        scored = self.scores(question)
+        if not scored:
+            return GENERAL
+        intent, probability = scored[0]
+        runner_up = scored[1][1] if len(scored) > 1 else 0.0
+        if probability < self.min_confidence or probability - runner_up < self.min_margin:
+            return GENERAL
+        return intent
+
+    @classmethod
+    def train(cls, questions, labels, hash_bits=HASH_BITS, epochs=TRAIN_EPOCHS):
+        """Fit on labelled questions with full-batch gradient descent"""
+        classes = sorted(set(labels))
+        n_features = 1 << hash_bits
+        model = cls(classes, np.ones(n_features), np.zeros((n_features, len(classes))), np.zeros(len(classes)))
+
+        # Inverse document frequency over the training questions
+        document_frequency = np.zeros(n_features, dtype=np.float32)
+        for question in questions:
+            document_frequency[list(feature_counts(question, n_features - 1))] += 1
+        model.idf = np.log((1 + len(questions)) / (1 + document_frequency)).astype(np.float32) + 1.0
+
+        rows, columns, values = model._vectorize(questions)
+        targets = np.zeros((len(questions), len(classes)), dtype=np.float32)
+        targets[np.arange(len(questions)), [classes.index(label) for label in labels]] = 1.0
+        for _ in range(epochs):
+            logits = model._logits(len(questions), rows, columns, values, model.weights, model.bias)
+            probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            error = (probabilities - targets) / len(questions)
+            gradient = L2_PENALTY * model.weights
+            np.add.at(gradient, columns, values[:, None] * error[rows])
+            model.weights -= LEARNING_RATE * gradient
+            model.bias -= LEARNING_RATE * error.sum(axis=0)
+        return model
+
+
+def load_classifier(path):
+    """The trained classifier, or None when no model has been trained"""
+    if not os.path.exists(path):
+        return None
+    try:
+        classifier = IntentClassifier.load(path)
+    except Exception as e:
+        logger.warning(f"Could not load intent model {path}: {e}")
+        return None
+    logger.info(f"Loaded intent classifier from {path} ({len(classifier.classes)} intents)")
+    return classifier
+
+
+def benchmark(matcher, classifier, questions, repeat=5):
+    """Per-question latency of the keyword matcher and the classifier, single and batched.
+
+    agreement compares the intents each would actually serve (best()).
+    """
+    def per_question(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / (repeat * len(questions)) * 1e6
+
+    return {
+        'keyword_us': per_question(lambda: [matcher.best(question) for question in questions]),
+        'classifier_us': per_question(lambda: [classifier.best(question) for question in questions]),
+        'classifier_batch_us': per_question(lambda: classifier.predict(questions)),
+        'agreement': sum(matcher.best(question) == classifier.best(question) for question in questions) / len(questions)
+    }
@@ -0,0 +1,90 @@
+import string
+from functools import lru_cache
+
+GENERAL = "general"
+
+# Intent keywords in priority order; ties in score go to the earlier intent.
+# Keywords match whole words after crude stemming (see stem): "refunded" finds "refund" and
+# "new" never matches inside "renew", but a stem can collide with an unrelated word's.
+INTENT_KEYWORDS = [
+    ("trends", ["trend", "trends", "trending", "trendy", "popular", "latest", "new", "newest"]),
+    ("deals", ["best price", "best prices", "deal", "deals", "save", "saving", "savings",
+               "discount", "discounts", "discounted", "cheap", "cheaper", "cheapest"]),
+    ("recommendations", ["recommend", "recommends", "recommended", "recommendation", "recommendations",
+                         "suggest", "suggests", "suggestion", "suggestions", "best", "review", "reviews"]),
+    ("returns", ["customer service", "return", "returns", "returning", "exchange", "exchanges",
+                 "refund", "refunds"]),
+    ("online", ["online", "ecommerce", "e-commerce", "internet", "website", "websites"])
+]
+
+
+# Punctuation other than hyphens separates words ("e-commerce" stays one word)
+_SEPARATORS = str.maketrans({char: " " for char in string.punctuation if char != "-"})
+
+
+def tokenize(question):
+    """Casefolded words of a question"""
+    return question.casefold().translate(_SEPARATORS).split()
+
+
+# Crude suffix stripping so "returned", "returns" and "returning" share a stem.
+# Each suffix has a shortest stem it may leave, so "latest" doesn't fold into "late".
+SUFFIXES = (("ing", 3), ("est", 4), ("ed", 3), ("es", 3), ("ly", 3), ("s", 3), ("e", 3))
+# Words whose stem would be a different word that is also a keyword
+UNSTEMMED = frozenset(["news", "newly"])
+
+
+@lru_cache(maxsize=1 << 16)
+def stem(word):
+    if word in UNSTEMMED:
+        return word
+    for suffix, shortest in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= shortest and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+class IntentMatcher:
+    """Score every intent in one pass over the question's words.
+
+    Keywords are compiled into word and word-pair lookup tables, so each
+    token costs one or two dict lookups however many keywords there are.
+    Keywords and question words are both stemmed, so inflected forms
+    ("exchanged", "cheaply") match too.
+    """
+
+    def __init__(self, intent_keywords=INTENT_KEYWORDS):
+        self.intents = [intent for intent, _ in intent_keywords]
+        self._priority = {intent: index for index, intent in enumerate(self.intents)}
+        self._words = {}
+        self._pairs = {}
+        for intent, keywords in intent_keywords:
+            for keyword in keywords:
+                table = self._pairs if " " in keyword else self._words
+                table.setdefault(" ".join(stem(word) for word in keyword.split()), intent)
+        self._pair_starts = {pair.split()[0] for pair in self._pairs}
+
+    def scores(self, question):
+        """[(intent, score)] for matched intents, best first"""
+        words = [stem(word) for word in tokenize(question)]
+        counts = {}
+        i = 0
+        while i < len(words):
+            word = words[i]
+            i += 1
+            # Two-word keywords ("best price") take precedence over their first word
+            if word in self._pair_starts and i < len(words):
+                intent = self._pairs.get(f"{word} {words[i]}")
+                if intent is not None:
+                    i += 1
+                    counts[intent] = counts.get(intent, 0) + 1
+                    continue
+            intent = self._words.get(word)
+            if intent is not None:
+                counts[intent] = counts.get(intent, 0) + 1
+        return sorted(counts.items(), key=lambda item: (-item[1], self._priority[item[0]]))
+
+    def best(self, question):
+        """The top intent, or GENERAL when nothing matched"""
+        scored = self.scores(question)
+        return scored[0][0] if scored else GENERAL
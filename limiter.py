@@ -0,0 +1,192 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Per-process bulkhead around upstream calls
+LIMITER_INITIAL = float(os.environ.get("LIMITER_INITIAL", 10))
+LIMITER_MIN = float(os.environ.get("LIMITER_MIN", 2))
+LIMITER_MAX = float(os.environ.get("LIMITER_MAX", 100))
+LIMITER_QUEUE_SIZE = int(os.environ.get("LIMITER_QUEUE_SIZE", 50))
+LIMITER_MAX_WAIT = float(os.environ.get("LIMITER_MAX_WAIT", 5))
+LIMITER_SMOOTHING = float(os.environ.get("LIMITER_SMOOTHING", 0.2))
+LIMITER_RTT_TOLERANCE = float(os.environ.get("LIMITER_RTT_TOLERANCE", 1.5))
+
+# Forget the no-load latency now and then so the limit can recover after upstream changes
+MIN_RTT_RESET_SAMPLES = 500
+BACKOFF_RATIO = 0.9
+
+
+class LimitExceeded(Exception):
+    """Raised when the bulkhead sheds a request; retry_after is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Slot:
+    """One admitted call.
+
+    Set dropped for upstream overload (timeouts, 429s), latency to override
+    the measured time, or skip to release without feeding the limit.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.dropped = False
+        self.skip = False
+        self.latency = None
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with a bounded wait queue and gradient-based adaptation.
+
+    The limit follows the ratio between the best latency seen (upstream with
+    no queueing) and the current latency: while they agree the limit grows
+    by about sqrt(limit), and as latency climbs the limit shrinks in
+    proportion. Timeouts and upstream 429s back it off multiplicatively.
+    Callers beyond the limit wait in a queue of queue_size; anyone past
+    that is shed immediately with LimitExceeded.
+    """
+
+    def __init__(self, initial=LIMITER_INITIAL, min_limit=LIMITER_MIN, max_limit=LIMITER_MAX,
+                 queue_size=LIMITER_QUEUE_SIZE, smoothing=LIMITER_SMOOTHING, tolerance=LIMITER_RTT_TOLERANCE):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.inflight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._cond = threading.Condition()
+        self._async_waiters = deque()
+        self._min_rtt = None
+        self._last_rtt = None
+        self._samples = 0
+
+    def _has_capacity(self):
+        return self.inflight < max(1, int(self.limit))
+
+    def _retry_after(self):
+        """Rough time until a queued slot frees up, in whole seconds"""
+        rtt = self._last_rtt or 1.0
+        backlog = (self.waiting + 1) / max(1.0, self.limit)
+        return max(1, math.ceil(rtt * backlog))
+
+    def _shed(self):
+        self.shed += 1
+        raise LimitExceeded("Upstream concurrency limit reached", self._retry_after())
+
+    def acquire(self, timeout):
+        """Take a slot, waiting up to timeout in the queue"""
+        with self._cond:
+            if self._has_capacity():
+                self.inflight += 1
+                return Slot()
+            if self.waiting >= self.queue_size:
+                self._shed()
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(self._has_capacity, min(timeout, LIMITER_MAX_WAIT))
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self._shed()
+            self.inflight += 1
+            return Slot()
+
+    async def aacquire(self, timeout):
+        """Async variant of acquire"""
+        loop = asyncio.get_running_loop()
+        end = time.monotonic() + min(timeout, LIMITER_MAX_WAIT)
+        with self._cond:
+            if self._has_capacity():
+                self.inflight += 1
+                return Slot()
+            if self.waiting >= self.queue_size:
+                self._shed()
+            self.waiting += 1
+        try:
+            while True:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self._shed()
+                future = loop.create_future()
+                with self._cond:
+                    if self._has_capacity():
+                        self.inflight += 1
+                        return Slot()
+                    self._async_waiters.append((loop, future))
+                try:
+                    await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self, slot):
+        """Return a slot and feed its latency into the limit"""
+        latency = slot.latency if slot.latency is not None else time.monotonic() - slot.start
+        with self._cond:
+            self.inflight -= 1
+            if not slot.skip:
+                self._update(latency, slot.dropped)
+            self._cond.notify()
+            while self._async_waiters:
+                loop, future = self._async_waiters.popleft()
+                if not future.done():
+                    loop.call_soon_threadsafe(_wake, future)
+                    break
+
+    def _update(self, rtt, dropped):
+        if dropped:
+            new_limit = self.limit * BACKOFF_RATIO
+        else:
+            self._last_rtt = rtt
+            self._samples += 1
+            if self._min_rtt is None or self._samples % MIN_RTT_RESET_SAMPLES == 0:
+                self._min_rtt = rtt
+            self._min_rtt = min(self._min_rtt, rtt)
+            gradient = max(0.5, min(1.0, self.tolerance * self._min_rtt / max(rtt, 1e-6)))
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+            # Don't grow the limit while we aren't using most of it
+            if self.inflight * 2 < self.limit:
+                new_limit = min(new_limit, self.limit)
+        smoothed = (1 - self.smoothing) * self.limit + self.smoothing * new_limit
+        self.limit = max(self.min_limit, min(self.max_limit, smoothed))
+
+    def reject(self, reason):
+        """Shed a call turned away before it reached the limiter, counted with the rest"""
+        with self._cond:
+            self.shed += 1
+            raise LimitExceeded(reason, self._retry_after())
+
+    def saturated(self):
+        """True when a new call would be shed right now (no free slot and a full queue)"""
+        with self._cond:
+            return not self._has_capacity() and self.waiting >= self.queue_size
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'limit': round(self.limit, 1),
+                'inflight': self.inflight,
+                'waiting': self.waiting,
+                'shed': self.shed,
+                'min_rtt_ms': round(self._min_rtt * 1000, 1) if self._min_rtt is not None else None
+            }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
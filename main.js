@@ -61,10 +61,64 @@ function handleFormSubmit(event) {
     // Show loading state
     showLoadingState();
     
+    // Stream the answer in place when the browser supports it
+    if (window.ReadableStream && window.TextDecoder) {
+        event.preventDefault();
+        streamAnswer(question).catch(error => {
+            console.error('Streaming failed, falling back to form submit:', error);
+            // form.submit() skips this handler, so the page posts normally
+            event.target.submit();
+        });
+        return false;
+    }
+    
     // Let the form submit normally (server-side processing)
     return true;
 }
 
+async function streamAnswer(question) {
+    const card = document.getElementById('streamAnswerCard');
+    const answerText = document.getElementById('streamAnswerText');
+    const timings = document.getElementById('streamTimings');
+    let started = false;
+    
+    try {
+        await askQuestionStream(question, {
+            onToken(text) {
+                if (!started) {
+                    started = true;
+                    // First token: swap the spinner for the answer card
+                    const previous = document.getElementById('answerCard');
+                    if (previous) {
+                        previous.hidden = true;
+                    }
+                    document.getElementById('streamQuestion').textContent = `"${question}"`;
+                    answerText.textContent = '';
+                    timings.textContent = '';
+                    card.hidden = false;
+                    hideLoadingState();
+                }
+                answerText.textContent += text;
+            },
+            onDone(result) {
+                if (result.cached) {
+                    timings.textContent = `Answered from cache in ${Math.round(result.total_ms)} ms`;
+                } else if (result.ttft_ms !== null) {
+                    timings.textContent = `First token in ${Math.round(result.ttft_ms)} ms · complete in ${Math.round(result.total_ms)} ms`;
+                }
+            }
+        });
+    } catch (error) {
+        // Only fall back to a full page submit if nothing was shown yet
+        if (!started) {
+            throw error;
+        }
+        showAlert('The answer stream was interrupted. Please try again.', 'warning');
+    } finally {
+        hideLoadingState();
+    }
+}
+
 function showLoadingState() {
     const submitBtn = document.getElementById('submitBtn');
     const loadingSpinner = document.getElementById('loadingSpinner');
@@ -100,7 +154,9 @@ function autoResizeTextarea() {
 }
 
 function copyAnswer() {
-    const answerContent = document.querySelector('.answer-content div.mt-2');
+    // Prefer the streamed answer when it is the one on screen
+    const answerContent = document.querySelector('#streamAnswerCard:not([hidden]) .answer-content div.mt-2')
+        || document.querySelector('.answer-content div.mt-2');
     if (answerContent) {
         // Create a temporary textarea to copy the text content
         const tempTextarea = document.createElement('textarea');
@@ -175,28 +231,111 @@ function initializeTooltips() {
 }
 
 // API helper functions for future AJAX implementation
-async function askQuestionAPI(question) {
+async function askQuestionAPI(question, maxRetries = 3) {
     try {
-        const response = await fetch('/api/ask', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ question: question })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+        for (let attempt = 0; ; attempt++) {
+            const response = await fetch('/api/ask', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ question: question })
+            });
+            
+            // The server sheds load with 429/503 + Retry-After; wait and try again
+            const retryAfter = response.headers.get('Retry-After');
+            const shed = response.status === 429 || (response.status === 503 && retryAfter !== null);
+            if (shed && attempt < maxRetries) {
+                await sleep(retryDelayMs(retryAfter, attempt));
+                continue;
+            }
+            
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            
+            const data = await response.json();
+            return data;
         }
-        
-        const data = await response.json();
-        return data;
     } catch (error) {
         console.error('Error asking question:', error);
         throw error;
     }
 }
 
+function retryDelayMs(retryAfter, attempt) {
+    // Retry-After is either delay-seconds or an HTTP date
+    let baseMs = Math.pow(2, attempt) * 1000;
+    if (retryAfter !== null) {
+        const seconds = Number(retryAfter);
+        if (!Number.isNaN(seconds)) {
+            baseMs = seconds * 1000;
+        } else if (!Number.isNaN(Date.parse(retryAfter))) {
+            baseMs = Math.max(0, Date.parse(retryAfter) - Date.now());
+        }
+    }
+    // Jitter so shed clients don't all come back at the same instant
+    return baseMs + Math.random() * Math.max(baseMs, 500);
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+// Stream an answer from /api/ask/stream, calling onToken for each server-sent token
+async function askQuestionStream(question, { onToken, onDone } = {}) {
+    const response = await fetch('/api/ask/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify({ question: question })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const parsed = parseServerSentEvent(rawEvent);
+            if (parsed.event === 'token' && onToken) {
+                onToken(parsed.data.text);
+            } else if (parsed.event === 'done' && onDone) {
+                onDone(parsed.data);
+            }
+        }
+    }
+}
+
+function parseServerSentEvent(rawEvent) {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event: event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+}
+
 // Utility functions
 function debounce(func, wait) {
     let timeout;
@@ -236,5 +375,6 @@ window.retailQA = {
     copyAnswer,
     clearAnswer,
     showAlert,
-    askQuestionAPI
+    askQuestionAPI,
+    askQuestionStream
 };
@@ -0,0 +1,136 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Retry policy for HTTP 503 "model is loading" responses
+LOADING_MAX_RETRIES = int(os.environ.get("HF_LOADING_MAX_RETRIES", 3))
+LOADING_BACKOFF_BASE = float(os.environ.get("HF_LOADING_BACKOFF_BASE", 0.5))
+LOADING_MAX_WAIT = float(os.environ.get("HF_LOADING_MAX_WAIT", 20))
+DEFAULT_LOADING_ESTIMATE = 10.0
+
+# A poll that hasn't reported back after this long no longer blocks others
+POLL_STALE_SECONDS = 30.0
+
+# Async waiters re-check the shared state at least this often
+ASYNC_RECHECK_SECONDS = 1.0
+
+
+def loading_estimate(response):
+    """Seconds HuggingFace expects the model to keep loading, or None"""
+    if response.status_code != 503:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    if 'estimated_time' not in body and 'loading' not in str(body.get('error', '')).lower():
+        return None
+    try:
+        return max(0.0, float(body.get('estimated_time') or DEFAULT_LOADING_ESTIMATE))
+    except (TypeError, ValueError):
+        return DEFAULT_LOADING_ESTIMATE
+
+
+class ModelLoadingState:
+    """Shared "model is loading" state for one upstream model.
+
+    When a request sees a loading 503, every request for the model waits
+    out the estimate instead of hitting upstream. Once it elapses a single
+    request is allowed to poll; the rest keep waiting (with jittered
+    backoff) until that poll reports the model ready or loading again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.loading_responses = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._ready.set()
+        self._loading_until = 0.0
+        self._poll_started = None
+
+    @property
+    def loading(self):
+        return not self._ready.is_set()
+
+    def next_wait(self, attempt):
+        """Seconds to wait before calling upstream; 0 means go now"""
+        if self._ready.is_set():
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            polling = self._poll_started is not None and now - self._poll_started < POLL_STALE_SECONDS
+            if now >= self._loading_until and not polling:
+                # This caller makes the next poll for everyone
+                self._poll_started = now
+                return 0.0
+            base = max(0.0, self._loading_until - now)
+        jitter = random.uniform(0, LOADING_BACKOFF_BASE * (2 ** attempt))
+        return min(base + jitter, LOADING_MAX_WAIT)
+
+    def mark_loading(self, estimate):
+        with self._lock:
+            self.loading_responses += 1
+            self._loading_until = time.monotonic() + estimate
+            self._poll_started = None
+            self._ready.clear()
+        logger.info(f"Model {self.name} is loading, estimated {estimate:.1f}s")
+
+    def mark_ready(self):
+        if self._ready.is_set():
+            return
+        with self._lock:
+            self._loading_until = 0.0
+            self._poll_started = None
+            self._ready.set()
+        logger.info(f"Model {self.name} finished loading")
+
+    def abandon_poll(self):
+        """Let another caller poll after this one failed without an answer"""
+        with self._lock:
+            self._poll_started = None
+
+    def wait(self, seconds):
+        """Block up to seconds, returning early once the model is ready"""
+        self._ready.wait(seconds)
+
+    async def await_wait(self, seconds):
+        """Async counterpart of wait"""
+        end = time.monotonic() + seconds
+        while self.loading and time.monotonic() < end:
+            await asyncio.sleep(min(ASYNC_RECHECK_SECONDS, end - time.monotonic()))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'loading': self.loading,
+                'seconds_remaining': round(max(0.0, self._loading_until - time.monotonic()), 1),
+                'loading_responses': self.loading_responses
+            }
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def get_loading_state(name):
+    """Return the loading state for a model, creating it on first use"""
+    with _states_lock:
+        state = _states.get(name)
+        if state is None:
+            state = _states[name] = ModelLoadingState(name)
+        return state
+
+
+def loading_snapshots():
+    """Loading state of every model, keyed by model name"""
+    with _states_lock:
+        states = dict(_states)
+    return {name: state.snapshot() for name, state in states.items()}
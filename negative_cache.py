@@ -0,0 +1,60 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# How long an endpoint is skipped after a permanent-looking error, per error class
+NEGATIVE_CACHE_TTLS = {
+    403: ("insufficient_permissions", float(os.environ.get("NEGATIVE_CACHE_TTL_FORBIDDEN", 300))),
+    404: ("model_not_found", float(os.environ.get("NEGATIVE_CACHE_TTL_NOT_FOUND", 900)))
+}
+
+
+class NegativeCache:
+    """Remember upstream errors that won't fix themselves on a retry.
+
+    A 403 (token lacks permission) or 404 (model doesn't exist) is recorded
+    per (endpoint, error class) and the endpoint is skipped until the entry
+    expires, so requests go straight to the matching demo answer instead of
+    repeating a call that is bound to fail.
+    """
+
+    def __init__(self, ttls=NEGATIVE_CACHE_TTLS):
+        self.ttls = ttls
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, endpoint, status_code):
+        """Remember an error response; ignored for statuses that aren't cached"""
+        if status_code not in self.ttls:
+            return
+        error_type, ttl = self.ttls[status_code]
+        with self._lock:
+            known = (endpoint, error_type) in self._entries
+            self._entries[(endpoint, error_type)] = time.monotonic() + ttl
+        if not known:
+            logger.warning(f"Skipping {endpoint} for {ttl:.0f}s after {status_code} ({error_type})")
+
+    def blocked(self, endpoint):
+        """The cached error class for an endpoint, or None"""
+        now = time.monotonic()
+        with self._lock:
+            for (name, error_type), expires in list(self._entries.items()):
+                if name != endpoint:
+                    continue
+                if expires <= now:
+                    del self._entries[(name, error_type)]
+                    continue
+                return error_type
+        return None
+
+    def snapshot(self):
+        """Seconds left on each active entry"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{name}:{error_type}": round(expires - now, 1)
+                for (name, error_type), expires in self._entries.items() if expires > now
+            }
@@ -0,0 +1,22 @@
+import re
+import json
+import hashlib
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question):
+    """Canonical form of a question: casefolded, single-spaced, no trailing ?!."""
+    question = _WHITESPACE.sub(" ", question.casefold()).strip()
+    return _TRAILING_PUNCTUATION.sub("", question)
+
+
+def question_key(question, model_id, params, prompt_version=None):
+    """Stable key for a question under a given model, generation parameters and prompt"""
+    raw = json.dumps(
+        [normalize_question(question), model_id, params, prompt_version],
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import logging
+import threading
+from logging.handlers import WatchedFileHandler
+
+from intents import GENERAL
+
+logger = logging.getLogger(__name__)
+
+# Answer sources
+EXACT = "exact_cache"
+SEMANTIC = "semantic_cache"
+RETRIEVAL = "retrieval"
+DEMO = "demo_bank"
+LLM = "llm"
+
+# Cheapest source whose quality (0-1) reaches this is used; the LLM rates PLANNER_LLM_QUALITY
+PLANNER_MIN_QUALITY = float(os.environ.get("PLANNER_MIN_QUALITY", 0.9))
+PLANNER_LLM_QUALITY = float(os.environ.get("PLANNER_LLM_QUALITY", 0.95))
+PLANNER_DEMO_QUALITY = float(os.environ.get("PLANNER_DEMO_QUALITY", 0.3))
+# Knowledge-base answers rate their coverage scaled by BM25 score up to this one, so only a
+# strong match on several terms pre-empts the LLM
+PLANNER_RETRIEVAL_SCORE = float(os.environ.get("PLANNER_RETRIEVAL_SCORE", 10.0))
+# One JSON line per decision for offline analysis (unset = planner_decisions.jsonl in the
+# app's instance folder, empty = off); rotate with logrotate
+PLANNER_LOG_PATH = os.environ.get("PLANNER_LOG_PATH")
+
+# Rough cost of asking each source, in milliseconds; the LLM's comes from measured latency
+SOURCE_COSTS = {
+    EXACT: 0.01,
+    DEMO: 0.01,
+    RETRIEVAL: 0.05,
+    SEMANTIC: 1.0,
+    LLM: 2000.0
+}
+
+
+class Option:
+    """What one source can offer: a quality score and the answer (or a note on why not)"""
+
+    __slots__ = ("quality", "value", "note")
+
+    def __init__(self, quality, value=None, note=None):
+        self.quality = quality
+        self.value = value
+        self.note = note
+
+
+class Decision:
+    def __init__(self, source, option, reason, intent, options):
+        self.source = source
+        self.option = option
+        self.reason = reason
+        self.intent = intent
+        self.options = options
+
+    @property
+    def value(self):
+        return self.option.value
+
+
+def _decision_log(path):
+    """A logger writing bare JSON lines to path, or None"""
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    decision_logger = logging.getLogger(f"{__name__}.decisions")
+    decision_logger.propagate = False
+    decision_logger.setLevel(logging.INFO)
+    if not decision_logger.handlers:
+        # Opened on first write so each forked worker appends through its own handle
+        handler = WatchedFileHandler(path, delay=True, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        decision_logger.addHandler(handler)
+    return decision_logger
+
+
+class Planner:
+    """Pick the cheapest answer source that is good enough.
+
+    Sources are probed lazily in order of cost, so an exact cache hit
+    never pays for an embedding and a well-covered FAQ never reaches the
+    LLM. Each probe returns an Option; the first whose quality reaches
+    min_quality wins. When none does (say upstream is down and nothing is
+    cached), the best option seen is used, with the demo bank as the
+    floor even when it is rated 0. The demo bank's quality comes from the
+    intent classifier: its canned answer for a recognised intent beats the
+    general one.
+    """
+
+    def __init__(self, classify, min_quality=PLANNER_MIN_QUALITY, demo_quality=PLANNER_DEMO_QUALITY,
+                 log_path=None):
+        self.classify = classify
+        self.min_quality = min_quality
+        self.demo_quality = demo_quality
+        self._log = None
+        try:
+            self._log = _decision_log(log_path)
+        except OSError as e:
+            logger.warning(f"Planner decisions will not be logged: {e}")
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def plan(self, question, probes, costs=None, signals=None):
+        """Choose among probes ({source: callable returning an Option}) for a question.
+
+        costs overrides SOURCE_COSTS for this decision (e.g. the LLM's
+        measured latency); signals are only logged.
+        """
+        start = time.perf_counter()
+        intent = self.classify(question)
+        probes = dict(probes)
+        probes[DEMO] = lambda: Option(self.demo_quality if intent != GENERAL else self.demo_quality / 2)
+        costs = {**SOURCE_COSTS, **(costs or {})}
+
+        options = {}
+        best_source = None
+        for source in sorted(probes, key=lambda name: costs.get(name, 0.0)):
+            option = probes[source]()
+            options[source] = option
+            if option.quality >= self.min_quality:
+                decision = Decision(source, option, "meets_threshold", intent, options)
+                break
+            if option.quality > 0 and (best_source is None or option.quality > options[best_source].quality):
+                best_source = source
+        else:
+            # Nothing is good enough: the best option seen, with the demo bank as the floor
+            source = best_source or DEMO
+            decision = Decision(source, options[source], "best_available", intent, options)
+
+        self._record(question, decision, costs, signals, time.perf_counter() - start)
+        return decision
+
+    def _record(self, question, decision, costs, signals, elapsed):
+        with self._lock:
+            self._counts[decision.source] = self._counts.get(decision.source, 0) + 1
+        if self._log is None:
+            return
+        self._log.info(json.dumps({
+            'ts': round(time.time(), 3),
+            'question': question,
+            'intent': decision.intent,
+            'source': decision.source,
+            'reason': decision.reason,
+            'quality': round(decision.option.quality, 3),
+            'options': {
+                source: {'quality': round(option.quality, 3), 'cost_ms': costs.get(source), 'note': option.note}
+                for source, option in decision.options.items()
+            },
+            'signals': signals or {},
+            'plan_ms': round(elapsed * 1000, 3)
+        }, ensure_ascii=False))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'min_quality': self.min_quality,
+            'decisions': counts
+        }
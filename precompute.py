@@ -0,0 +1,61 @@
+import os
+import re
+import html
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Offline answer precompute
+PRECOMPUTE_CONCURRENCY = int(os.environ.get("PRECOMPUTE_CONCURRENCY", 4))
+PRECOMPUTE_FILE = os.environ.get("PRECOMPUTE_FILE")
+
+_DATA_QUESTION = re.compile(r'data-question="([^"]+)"')
+
+
+def template_questions(path):
+    """The example questions wired to buttons in a template"""
+    with open(path, encoding="utf-8") as f:
+        return [html.unescape(question) for question in _DATA_QUESTION.findall(f.read())]
+
+
+def file_questions(path):
+    """One question per line; blank lines and # comments are skipped"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def collect_questions(template_path, extra_path=None):
+    """Template questions plus an optional question file, without duplicates"""
+    questions = template_questions(template_path)
+    if extra_path:
+        questions += file_questions(extra_path)
+    return list(dict.fromkeys(questions))
+
+
+def precompute(questions, refresh_fn, concurrency=PRECOMPUTE_CONCURRENCY):
+    """Run refresh_fn over questions with bounded concurrency.
+
+    refresh_fn(question) returns "cached", "filled" or "failed"; the counts
+    of each are returned.
+    """
+    start = time.monotonic()
+    counts = {"cached": 0, "filled": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="precompute") as pool:
+        for question, outcome in zip(questions, pool.map(_safely(refresh_fn), questions)):
+            counts[outcome] += 1
+            if outcome == "failed":
+                logger.warning(f"Could not precompute an answer for: {question}")
+    logger.info(f"Precomputed {len(questions)} questions in {time.monotonic() - start:.1f}s: {counts}")
+    return counts
+
+
+def _safely(refresh_fn):
+    def run(question):
+        try:
+            return refresh_fn(question)
+        except Exception as e:
+            logger.warning(f"Precompute error: {e}")
+            return "failed"
+    return run
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+
+import hf_client
+
+logger = logging.getLogger(__name__)
+
+# Provider registry: UPSTREAM_PROVIDERS (JSON) or UPSTREAM_PROVIDERS_FILE (path to JSON)
+UPSTREAM_PROVIDERS = os.environ.get("UPSTREAM_PROVIDERS")
+UPSTREAM_PROVIDERS_FILE = os.environ.get("UPSTREAM_PROVIDERS_FILE")
+DEFAULT_MODEL = os.environ.get("HUGGINGFACE_MODEL", "google/flan-t5-small")
+
+# Routing score = EWMA latency * (1 + ERROR_PENALTY * EWMA error rate)
+EWMA_ALPHA = float(os.environ.get("ROUTING_EWMA_ALPHA", 0.2))
+ERROR_PENALTY = float(os.environ.get("ROUTING_ERROR_PENALTY", 10))
+# How long an endpoint counts as out of quota after a 429 without a usable Retry-After
+QUOTA_DEFAULT_BACKOFF = float(os.environ.get("QUOTA_DEFAULT_BACKOFF", 60))
+
+HF_MODEL = "hf_model"
+HF_ENDPOINT = "hf_endpoint"
+OPENAI = "openai"
+
+
+class Endpoint:
+    """One upstream text-generation endpoint and its observed health.
+
+    hf_model       -- a model on the serverless HuggingFace Inference API
+    hf_endpoint    -- a dedicated HuggingFace inference endpoint URL
+    openai         -- an OpenAI-compatible /v1/completions server (e.g. local)
+    """
+
+    def __init__(self, name, kind=HF_MODEL, model=None, url=None, weight=1.0, api_key_env=None):
+        if kind not in (HF_MODEL, HF_ENDPOINT, OPENAI):
+            raise ValueError(f"Unknown provider type: {kind}")
+        self.name = name
+        self.kind = kind
+        self.model = model or name
+        self.weight = max(float(weight), 0.0)
+        if kind == HF_MODEL:
+            self.url = url or f"{hf_client.HF_API_BASE}/models/{self.model}"
+        elif kind == OPENAI:
+            self.url = f"{(url or 'http://localhost:8000/v1').rstrip('/')}/completions"
+        else:
+            if not url:
+                raise ValueError(f"Provider {name} needs a url")
+            self.url = url
+        self.api_key_env = api_key_env or ("HUGGINGFACE_API_KEY" if kind != OPENAI else None)
+        # Headers and auth are built once per endpoint
+        self.headers = {"Content-Type": "application/json"}
+        api_key = self.api_key()
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self._lock = threading.Lock()
+        self.ewma_latency = None
+        self.ewma_error_rate = 0.0
+        self.calls = 0
+        self.quota_remaining = None
+        self.quota_reset_at = None
+
+    def api_key(self):
+        return os.getenv(self.api_key_env) if self.api_key_env else None
+
+    def configured(self):
+        """True when the endpoint has the credentials it needs"""
+        return self.api_key_env is None or bool(self.api_key())
+
+    def build_payload(self, prompts, params):
+        """Payload for one prompt (str) or a batch of prompts (list)"""
+        if self.kind == OPENAI:
+            payload = {
+                "model": self.model,
+                "prompt": prompts,
+                "max_tokens": params.get("max_new_tokens"),
+                "temperature": params.get("temperature")
+            }
+            return {key: value for key, value in payload.items() if value is not None}
+        return {"inputs": prompts, "parameters": dict(params)}
+
+    def build_stream_payload(self, prompt, params):
+        """Payload asking the endpoint to stream tokens as server-sent events"""
+        payload = self.build_payload(prompt, params)
+        payload["stream"] = True
+        return payload
+
+    def token_from_event(self, data):
+        """Text carried by one streamed SSE data field, or None"""
+        if data == "[DONE]":
+            return None
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return None
+        if self.kind == OPENAI:
+            choice = (event.get("choices") or [{}])[0]
+            return choice.get("text") or (choice.get("delta") or {}).get("content")
+        token = event.get("token") or {}
+        if token.get("special"):
+            return None
+        return token.get("text")
+
+    def results(self, body):
+        """Normalize a 200 body into the HuggingFace list-of-results shape"""
+        if self.kind == OPENAI:
+            choices = sorted(body.get("choices", []), key=lambda choice: choice.get("index", 0))
+            return [{"generated_text": choice.get("text", "")} for choice in choices]
+        return body
+
+    def record(self, latency, ok):
+        """Fold one call's latency and outcome into the EWMA routing stats"""
+        with self._lock:
+            self.calls += 1
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+            else:
+                self.ewma_latency += EWMA_ALPHA * (latency - self.ewma_latency)
+            self.ewma_error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.ewma_error_rate)
+
+    def record_quota(self, status_code, headers):
+        """Track the provider's rate-limit headers; a 429 means no quota until it resets"""
+        remaining = _header_number(headers, "x-ratelimit-remaining", "ratelimit-remaining")
+        reset = _header_number(headers, "retry-after", "x-ratelimit-reset", "ratelimit-reset")
+        if status_code == 429:
+            remaining = 0
+        if remaining is None:
+            return
+        now = time.time()
+        if reset is None:
+            reset = QUOTA_DEFAULT_BACKOFF
+        # Reset headers come as seconds from now or as a Unix timestamp
+        reset_at = reset if reset > 1e9 else now + reset
+        with self._lock:
+            self.quota_remaining = int(remaining)
+            self.quota_reset_at = reset_at
+
+    def quota_left(self):
+        """Requests left in the current rate-limit window, or None when the provider doesn't say"""
+        with self._lock:
+            if self.quota_reset_at is not None and time.time() >= self.quota_reset_at:
+                self.quota_remaining = self.quota_reset_at = None
+            return self.quota_remaining
+
+    def score(self):
+        """Lower is better; unmeasured endpoints score 0 so they get explored"""
+        with self._lock:
+            latency = self.ewma_latency or 0.0
+            return latency * (1 + ERROR_PENALTY * self.ewma_error_rate)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'type': self.kind,
+                'model': self.model,
+                'weight': self.weight,
+                'calls': self.calls,
+                'ewma_latency_ms': round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+                'ewma_error_rate': round(self.ewma_error_rate, 3),
+                'quota_remaining': self.quota_remaining
+            }
+
+
+def _header_number(headers, *names):
+    for name in names:
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+class ProviderRouter:
+    """Pick an upstream endpoint per request.
+
+    Two candidates are drawn at random in proportion to their configured
+    weights and the one with the better latency/error score wins, which
+    steers traffic away from slow or failing endpoints without sending
+    everything to a single one.
+    """
+
+    def __init__(self, endpoints):
+        if not endpoints:
+            raise ValueError("At least one upstream provider is required")
+        self.endpoints = list(endpoints)
+        self._by_name = {endpoint.name: endpoint for endpoint in self.endpoints}
+
+    def get(self, name):
+        return self._by_name[name]
+
+    def names(self):
+        return [endpoint.name for endpoint in self.endpoints]
+
+    def choose(self, is_available, exclude=()):
+        """Choose an endpoint for which is_available(endpoint) holds, or None"""
+        candidates = [endpoint for endpoint in self.endpoints
+                      if endpoint.name not in exclude and endpoint.weight > 0 and is_available(endpoint)]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.choices(candidates, weights=[endpoint.weight for endpoint in candidates], k=2)
+        return first if first.score() <= second.score() else second
+
+    def snapshot(self):
+        return {endpoint.name: endpoint.snapshot() for endpoint in self.endpoints}
+
+
+def load_endpoints():
+    """Build endpoints from the configured registry, defaulting to one HF model"""
+    raw = UPSTREAM_PROVIDERS
+    if not raw and UPSTREAM_PROVIDERS_FILE:
+        with open(UPSTREAM_PROVIDERS_FILE, encoding="utf-8") as f:
+            raw = f.read()
+    if not raw:
+        return [Endpoint(DEFAULT_MODEL, HF_MODEL, model=DEFAULT_MODEL)]
+
+    endpoints = []
+    for entry in json.loads(raw):
+        endpoints.append(Endpoint(
+            entry["name"],
+            kind=entry.get("type", HF_MODEL),
+            model=entry.get("model"),
+            url=entry.get("url"),
+            weight=entry.get("weight", 1.0),
+            api_key_env=entry.get("api_key_env")
+        ))
+    logger.info(f"Loaded upstream providers: {', '.join(endpoint.name for endpoint in endpoints)}")
+    return endpoints
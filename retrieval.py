@@ -0,0 +1,288 @@
+import os
+import math
+import time
+import hashlib
+import logging
+
+import numpy as np
+
+from intents import stem, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Offline answers from a folder of retail knowledge documents (.md / .txt)
+KNOWLEDGE_BASE_DIR = os.environ.get(
+    "KNOWLEDGE_BASE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base"))
+# Unset = knowledge_index.npz in the app's instance folder
+KNOWLEDGE_INDEX_PATH = os.environ.get("KNOWLEDGE_INDEX_PATH")
+# A passage is used as an answer only when it contains this share of the question's
+# (idf-weighted) terms, at least RETRIEVAL_MIN_TERMS of them, and scores RETRIEVAL_MIN_SCORE (BM25)
+RETRIEVAL_MIN_COVERAGE = float(os.environ.get("RETRIEVAL_MIN_COVERAGE", 0.5))
+RETRIEVAL_MIN_TERMS = int(os.environ.get("RETRIEVAL_MIN_TERMS", 2))
+RETRIEVAL_MIN_SCORE = float(os.environ.get("RETRIEVAL_MIN_SCORE", 4.5))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 2))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+PASSAGE_MAX_CHARS = 800
+DOCUMENT_SUFFIXES = (".md", ".txt")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it me my of on or should
+so the their there this to what when where which who why will with you your
+""".split())
+
+# Bump when terms() changes so saved indexes are rebuilt
+ANALYZER_VERSION = 3
+
+
+def terms(text):
+    """Index terms: stemmed lowercase words without stopwords"""
+    return [stem(word) for word in tokenize(text) if word not in STOPWORDS]
+
+
+def document_paths(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.endswith(DOCUMENT_SUFFIXES))
+    return sorted(paths)
+
+
+def corpus_signature(directory):
+    """Changes whenever a document is added, removed or edited, or the analyzer changes"""
+    digest = hashlib.sha256(f"analyzer:{ANALYZER_VERSION}\n".encode("utf-8"))
+    for path in document_paths(directory):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, directory)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def split_passages(text, title):
+    """(source, passage) pairs: one per markdown section, long sections split by paragraph"""
+    passages = []
+    heading = title
+    paragraphs = []
+
+    def flush():
+        chunk = ""
+        for paragraph in paragraphs:
+            if chunk and len(chunk) + len(paragraph) > PASSAGE_MAX_CHARS:
+                passages.append((heading, chunk))
+                chunk = ""
+            chunk = f"{chunk}\n\n{paragraph}" if chunk else paragraph
+        if chunk:
+            passages.append((heading, chunk))
+        paragraphs.clear()
+
+    for block in text.split("\n\n"):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#"):
+            first, _, rest = block.partition("\n")
+            flush()
+            heading = f"{title} › {first.lstrip('#').strip()}" if first.startswith("##") else first.lstrip("#").strip()
+            if first.startswith("# "):
+                title = heading
+            block = rest.strip()
+            if not block:
+                continue
+        paragraphs.append(block)
+    flush()
+    return passages
+
+
+class KnowledgeIndex:
+    """BM25 inverted index over knowledge-base passages.
+
+    Postings are stored flat (CSR style): the passages containing term i
+    are doc_ids[offsets[i]:offsets[i + 1]], each with its BM25 term weight
+    already computed, so a query is a few slice-adds into a score array.
+    The arrays are saved to a single .npz file.
+    """
+
+    def __init__(self, vocabulary, idf, offsets, doc_ids, weights, passages, sources, signature=""):
+        self.vocabulary = [str(term) for term in vocabulary]
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.passages = [str(passage) for passage in passages]
+        self.sources = [str(source) for source in sources]
+        self.signature = str(signature)
+        self._term_ids = {term: index for index, term in enumerate(self.vocabulary)}
+        # Unseen query terms count as rarer than anything indexed
+        self._unknown_idf = math.log(1 + (len(self.passages) + 0.5) / 0.5)
+
+    def __len__(self):
+        return len(self.passages)
+
+    @classmethod
+    def build(cls, directory=KNOWLEDGE_BASE_DIR):
+        passages, sources = [], []
+        for path in document_paths(directory):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            title = os.path.splitext(os.path.relpath(path, directory))[0].replace("_", " ")
+            for source, passage in split_passages(text, title):
+                sources.append(source)
+                passages.append(passage)
+
+        postings = {}
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for doc_id, (source, passage) in enumerate(zip(sources, passages)):
+            # Headings are indexed with their section so "return window" finds "Return windows"
+            words = terms(f"{source} {passage}")
+            lengths[doc_id] = len(words)
+            counts = {}
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+            for word, count in counts.items():
+                postings.setdefault(word, []).append((doc_id, count))
+
+        vocabulary = sorted(postings)
+        count = len(passages)
+        average_length = float(lengths.mean()) if count else 1.0
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids, weights = [], []
+        for index, term in enumerate(vocabulary):
+            entries = postings[term]
+            idf[index] = math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+            offsets[index + 1] = offsets[index] + len(entries)
+            for doc_id, tf in entries:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / average_length)
+                doc_ids.append(doc_id)
+                weights.append(idf[index] * tf * (BM25_K1 + 1) / (tf + norm))
+        return cls(vocabulary, idf, offsets, doc_ids, weights, passages, sources, corpus_signature(directory))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["vocabulary"], data["idf"], data["offsets"], data["doc_ids"], data["weights"],
+                       data["passages"], data["sources"], data["signature"])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Written aside and renamed so workers never load a half-written index
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(
+                f, vocabulary=np.array(self.vocabulary, dtype=str), idf=self.idf, offsets=self.offsets,
+                doc_ids=self.doc_ids, weights=self.weights, passages=np.array(self.passages, dtype=str),
+                sources=np.array(self.sources, dtype=str), signature=np.array(self.signature)
+            )
+        os.replace(temporary, path)
+
+    def search(self, question, k=RETRIEVAL_TOP_K):
+        """[(score, coverage, matched, passage, source)] for the best k passages, best first.
+
+        coverage is the idf-weighted share of the question's terms the
+        passage contains, which unlike a raw BM25 score is comparable
+        across questions; matched is how many distinct terms it contains.
+        """
+        query = set(terms(question))
+        if not query or not self.passages:
+            return []
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        matched = np.zeros(len(self.passages), dtype=np.float32)
+        hits = np.zeros(len(self.passages), dtype=np.int32)
+        total_idf = 0.0
+        for term in query:
+            index = self._term_ids.get(term)
+            if index is None:
+                total_idf += self._unknown_idf
+                continue
+            start, end = self.offsets[index], self.offsets[index + 1]
+            docs = self.doc_ids[start:end]
+            scores[docs] += self.weights[start:end]
+            matched[docs] += self.idf[index]
+            hits[docs] += 1
+            total_idf += float(self.idf[index])
+        k = min(k, len(self.passages))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (float(scores[doc]), float(matched[doc]) / total_idf, int(hits[doc]), self.passages[doc], self.sources[doc])
+            for doc in top if scores[doc] > 0
+        ]
+
+
+class Retriever:
+    """Grounded answers from the knowledge base with no upstream call"""
+
+    def __init__(self, index=None, min_coverage=RETRIEVAL_MIN_COVERAGE, min_terms=RETRIEVAL_MIN_TERMS,
+                 min_score=RETRIEVAL_MIN_SCORE, top_k=RETRIEVAL_TOP_K):
+        self.index = index
+        self.min_coverage = min_coverage
+        self.min_terms = min_terms
+        self.min_score = min_score
+        self.top_k = top_k
+
+    @property
+    def enabled(self):
+        return self.index is not None and len(self.index) > 0
+
+    def lookup(self, question):
+        """(coverage, score, answer) from the best passages; (0.0, 0.0, None) when they don't answer the question.
+
+        Coverage alone passes any passage sharing the one or two content
+        words of a short question, so the best passage must also match
+        min_terms distinct terms and reach min_score.
+        """
+        if not self.enabled:
+            return 0.0, 0.0, None
+        results = self.index.search(question, self.top_k)
+        if not results:
+            return 0.0, 0.0, None
+        best, coverage, matched = results[0][:3]
+        if coverage < self.min_coverage or matched < self.min_terms or best < self.min_score:
+            return 0.0, 0.0, None
+        # Further passages only when they score close to the best one
+        sections = [
+            f"{passage}\n\n_Source: {source}_"
+            for score, _, _, passage, source in results if score >= best / 2
+        ]
+        return coverage, best, "**From our retail knowledge base:**\n\n" + "\n\n".join(sections)
+
+    def answer(self, question):
+        """A formatted answer from the best passages, or None when nothing covers the question"""
+        return self.lookup(question)[2]
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'passages': len(self.index),
+            'terms': len(self.index.vocabulary),
+            'min_coverage': self.min_coverage,
+            'min_terms': self.min_terms,
+            'min_score': self.min_score
+        }
+
+
+def load_index(path, directory=KNOWLEDGE_BASE_DIR):
+    """The saved index, rebuilt first when the documents changed since it was written"""
+    if not os.path.isdir(directory):
+        if os.path.exists(path):
+            return KnowledgeIndex.load(path)
+        return None
+    signature = corpus_signature(directory)
+    if os.path.exists(path):
+        try:
+            index = KnowledgeIndex.load(path)
+            if index.signature == signature:
+                return index
+        except Exception as e:
+            logger.warning(f"Could not load knowledge index {path}: {e}")
+    start = time.monotonic()
+    index = KnowledgeIndex.build(directory)
+    try:
+        index.save(path)
+    except OSError as e:
+        logger.warning(f"Could not save knowledge index {path}: {e}")
+    logger.info(f"Indexed {len(index)} passages from {directory} in {time.monotonic() - start:.2f}s")
+    return index
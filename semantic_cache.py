@@ -0,0 +1,422 @@
+import os
+import re
+import time
+import zlib
+import logging
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from normalize import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Semantic (nearest-question) cache
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_MODEL = os.environ.get("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 100000))
+
+# Below this many vectors a brute-force scan is fastest; above it the index is partitioned
+IVF_MIN_ENTRIES = 8192
+IVF_PROBES = 8
+IVF_TRAIN_ITERATIONS = 5
+IVF_TRAIN_SAMPLE = 20000
+HASHED_DIM = 512
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashedEmbedder:
+    """Dependency-free embedding: hashed words, word bigrams and character trigrams"""
+
+    name = "hashed-ngrams"
+    dim = HASHED_DIM
+
+    def embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _TOKEN.findall(text)
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _unit(vector)
+
+
+class SentenceEmbedder:
+    """Small sentence-transformers model run on the CPU"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, text):
+        return self._model.encode(text, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def load_embedder(model_name=SEMANTIC_CACHE_MODEL):
+    """The configured embedding model, or None when it can't be loaded.
+
+    Hashed n-grams are used only when asked for by name: their similarities
+    are not comparable with a sentence model's, so silently swapping them in
+    at the same threshold matches unrelated questions.
+    """
+    if model_name == HashedEmbedder.name:
+        return HashedEmbedder()
+    try:
+        return SentenceEmbedder(model_name)
+    except Exception as e:
+        logger.warning(f"Embedding model {model_name} unavailable ({e}), semantic cache disabled")
+        return None
+
+
+def _unit(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Cluster:
+    """Vectors assigned to one centroid, stored contiguously with spare capacity"""
+
+    __slots__ = ('vectors', 'ids', 'size')
+
+    def __init__(self, dim, capacity=64):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, vector, vector_id):
+        """Add a vector; returns its position in the cluster"""
+        if self.size == len(self.ids):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.ids = np.concatenate([self.ids, np.empty_like(self.ids)])
+        self.vectors[self.size] = vector
+        self.ids[self.size] = vector_id
+        self.size += 1
+        return self.size - 1
+
+    def extend(self, vectors, ids):
+        """Add several vectors; returns the position of the first"""
+        start = self.size
+        if start + len(ids) > len(self.ids):
+            capacity = max(2 * len(self.ids), start + len(ids))
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:start] = self.vectors[:start]
+            self.vectors = grown
+            self.ids = np.concatenate([self.ids[:start], np.empty(capacity - start, dtype=np.int64)])
+        self.vectors[start:start + len(ids)] = vectors
+        self.ids[start:start + len(ids)] = ids
+        self.size += len(ids)
+        return start
+
+    def keep(self, mask):
+        """Compact the cluster to the vectors where mask (over its current size) is true"""
+        count = int(mask.sum())
+        self.vectors[:count] = self.vectors[:self.size][mask]
+        self.ids[:count] = self.ids[:self.size][mask]
+        self.size = count
+
+    def remove(self, position):
+        """Drop the vector at position by moving the last one into it; returns the moved id or None"""
+        last = self.size - 1
+        self.size = last
+        if position == last:
+            return None
+        self.vectors[position] = self.vectors[last]
+        self.ids[position] = self.ids[last]
+        return int(self.ids[position])
+
+
+class _Partition:
+    """Centroids, their clusters and where each vector id sits, built by VectorIndex.partition"""
+
+    def __init__(self, centroids, clusters, cluster_of, position):
+        self.centroids = centroids
+        self.clusters = clusters
+        self.cluster_of = cluster_of
+        self.position = position
+
+
+class VectorIndex:
+    """Inner-product index over unit vectors with an IVF partition for large sizes.
+
+    Small indexes are scanned in full. Past IVF_MIN_ENTRIES the vectors are
+    clustered around sqrt(n) centroids; new vectors join their nearest
+    cluster and a query scans only the IVF_PROBES closest clusters. Once
+    max_entries is reached each new vector replaces the oldest one in
+    place, so eviction costs the same as an insert.
+
+    Centroids are retrained whenever as many vectors have been added as
+    the last training saw. The expensive part, partition(), reads no
+    mutable state of the index, so the owner can run it without its lock
+    between begin_training() and finish_training().
+    """
+
+    def __init__(self, dim, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.dim = dim
+        self.max_entries = max_entries
+        self._vectors = np.empty((min(1024, max_entries), dim), dtype=np.float32)
+        self._cluster_of = np.full(len(self._vectors), -1, dtype=np.int64)
+        self._position = np.zeros(len(self._vectors), dtype=np.int64)
+        self._keys = []
+        self._oldest = 0
+        self._partition = None
+        self._trained_size = 0
+        self._added = 0
+        # Ids written while a training runs, re-placed when it finishes
+        self._dirty = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self):
+        return self._keys
+
+    def add(self, vector, key):
+        """Store a vector; returns the key it replaced once the index is full, else None"""
+        evicted = None
+        n = len(self._keys)
+        if n < self.max_entries:
+            if n == len(self._vectors):
+                self._grow(min(n * 2, self.max_entries))
+            vector_id = n
+            self._keys.append(key)
+        else:
+            vector_id = self._oldest
+            self._oldest = (vector_id + 1) % self.max_entries
+            evicted = self._keys[vector_id]
+            self._keys[vector_id] = key
+            self._unassign(vector_id)
+        self._vectors[vector_id] = vector
+        self._added += 1
+        if self._dirty is not None:
+            self._dirty.add(vector_id)
+        if self._partition is not None:
+            self._assign(vector_id, vector)
+        return evicted
+
+    def _grow(self, capacity):
+        n = len(self._vectors)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:n] = self._vectors
+        self._vectors = vectors
+        self._cluster_of = np.concatenate([self._cluster_of, np.full(capacity - n, -1, dtype=np.int64)])
+        self._position = np.concatenate([self._position, np.zeros(capacity - n, dtype=np.int64)])
+
+    def _assign(self, vector_id, vector):
+        cluster_id = int(np.argmax(self._partition.centroids @ vector))
+        self._cluster_of[vector_id] = cluster_id
+        self._position[vector_id] = self._partition.clusters[cluster_id].append(vector, vector_id)
+
+    def _unassign(self, vector_id):
+        cluster_id = self._cluster_of[vector_id]
+        if self._partition is None or cluster_id < 0:
+            return
+        moved = self._partition.clusters[cluster_id].remove(self._position[vector_id])
+        if moved is not None:
+            self._position[moved] = self._position[vector_id]
+        self._cluster_of[vector_id] = -1
+
+    def search(self, vector):
+        """Return (key, similarity) of the nearest stored vector, or (None, 0.0)"""
+        n = len(self._keys)
+        if not n:
+            return None, 0.0
+        if self._partition is None:
+            scores = self._vectors[:n] @ vector
+            best = int(np.argmax(scores))
+            return self._keys[best], float(scores[best])
+
+        best_id, best_score = None, -1.0
+        centroids = self._partition.centroids
+        for cluster_id in np.argpartition(centroids @ vector, -IVF_PROBES)[-IVF_PROBES:]:
+            cluster = self._partition.clusters[cluster_id]
+            if not cluster.size:
+                continue
+            scores = cluster.vectors[:cluster.size] @ vector
+            index = int(np.argmax(scores))
+            if scores[index] > best_score:
+                best_id, best_score = int(cluster.ids[index]), float(scores[index])
+        if best_id is None:
+            return None, 0.0
+        return self._keys[best_id], best_score
+
+    def needs_training(self):
+        """True when the centroids are due for a (re)training and none is running"""
+        return (self._dirty is None and len(self._keys) >= IVF_MIN_ENTRIES
+                and self._added >= max(self._trained_size, IVF_MIN_ENTRIES))
+
+    def begin_training(self):
+        """(vectors, count) for partition(); writes from now on are tracked until finish_training"""
+        self._dirty = set()
+        return self._vectors, len(self._keys)
+
+    def partition(self, vectors, n):
+        """Cluster the first n vectors (slow; needs no lock)"""
+        vectors = vectors[:n]
+        count = max(IVF_PROBES, int(np.sqrt(n)))
+        rng = np.random.default_rng(n)
+        sample = vectors[rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=count, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster_id in range(count):
+                members = sample[assignment == cluster_id]
+                if len(members):
+                    centroids[cluster_id] = _unit(members.mean(axis=0))
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=count))])
+        position = np.zeros(n, dtype=np.int64)
+        clusters = []
+        for cluster_id in range(count):
+            ids = order[bounds[cluster_id]:bounds[cluster_id + 1]]
+            cluster = _Cluster(self.dim, capacity=max(64, 2 * len(ids)))
+            cluster.extend(vectors[ids], ids)
+            position[ids] = np.arange(len(ids))
+            clusters.append(cluster)
+        return _Partition(centroids, clusters, assignment.astype(np.int64), position)
+
+    def finish_training(self, partition, n):
+        """Swap in a partition of the first n vectors, re-placing any written since begin_training"""
+        dirty, self._dirty = self._dirty, None
+        if partition is None:
+            return
+        capacity = len(self._vectors)
+        self._cluster_of = np.full(capacity, -1, dtype=np.int64)
+        self._cluster_of[:n] = partition.cluster_of
+        self._position = np.zeros(capacity, dtype=np.int64)
+        self._position[:n] = partition.position
+        self._partition = partition
+        if dirty:
+            self._replace(np.fromiter(dirty, dtype=np.int64, count=len(dirty)), n)
+
+    def _replace(self, ids, n):
+        """Re-place ids written while the partition was built, a cluster at a time"""
+        clusters = self._partition.clusters
+        # The partition holds stale copies of ids below n that were overwritten
+        stale = ids[ids < n]
+        is_stale = np.zeros(len(self._vectors), dtype=bool)
+        is_stale[stale] = True
+        for cluster_id in np.unique(self._cluster_of[stale]):
+            cluster = clusters[cluster_id]
+            cluster.keep(~is_stale[cluster.ids[:cluster.size]])
+            self._position[cluster.ids[:cluster.size]] = np.arange(cluster.size)
+        # Every id past n was added while training ran, so it is in ids too
+        assignment = np.argmax(self._vectors[ids] @ self._partition.centroids.T, axis=1)
+        for cluster_id in np.unique(assignment):
+            members = ids[assignment == cluster_id]
+            start = clusters[cluster_id].extend(self._vectors[members], members)
+            self._cluster_of[members] = cluster_id
+            self._position[members] = np.arange(start, start + len(members))
+        self._trained_size = len(self._keys)
+        self._added = 0
+
+
+class SemanticCache:
+    """Map new questions onto previously answered ones by embedding similarity.
+
+    Stores only the exact-cache key of each answered question; the answer
+    itself stays in the exact cache so TTLs and eviction apply to both.
+    Nothing is matched until load() has loaded the embedding model, and
+    the cache turns itself off if the model can't be loaded. Index
+    retraining runs on a background thread, so requests only ever wait for
+    an insert or a search.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, enabled=SEMANTIC_CACHE_ENABLED,
+                 model_name=SEMANTIC_CACHE_MODEL, max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.matches = 0
+        self._lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._embedder = None
+        self._index = None
+        self._known = set()
+
+    def load(self):
+        """Load the embedding model (at start-up, so no request waits for it)"""
+        if not self.enabled or self._embedder is not None:
+            return
+        start = time.monotonic()
+        embedder = load_embedder(self.model_name)
+        if embedder is None:
+            self.enabled = False
+            return
+        with self._lock:
+            self._embed = lru_cache(maxsize=1024)(embedder.embed)
+            self._index = VectorIndex(embedder.dim, self.max_entries)
+            self._embedder = embedder
+        logger.info(f"Loaded embedding model {embedder.name} in {time.monotonic() - start:.2f}s")
+
+    def lookup(self, question):
+        """Return the key of the most similar answered question above the threshold, or None"""
+        return self.nearest(question)[0]
+
+    def nearest(self, question):
+        """(key, similarity) of the most similar answered question above the threshold, else (None, 0.0)"""
+        if not self.enabled or self._embedder is None:
+            return None, 0.0
+        start = time.perf_counter()
+        with self._lock:
+            key, similarity = self._index.search(self._embed(normalize_question(question)))
+            self.lookups += 1
+            self._lookup_seconds += time.perf_counter() - start
+            if key is not None and similarity >= self.threshold:
+                self.matches += 1
+                return key, float(similarity)
+        return None, 0.0
+
+    def add(self, question, key):
+        """Index an answered question under its exact-cache key"""
+        if not self.enabled or self._embedder is None:
+            return
+        with self._lock:
+            if key in self._known:
+                return
+            index = self._index
+            evicted = index.add(self._embed(normalize_question(question)), key)
+            self._known.add(key)
+            if evicted is not None:
+                self._known.discard(evicted)
+            if not index.needs_training():
+                return
+            vectors, n = index.begin_training()
+        threading.Thread(target=self._train, args=(index, vectors, n), name="semantic-index-train",
+                         daemon=True).start()
+
+    def _train(self, index, vectors, n):
+        """Re-cluster the index without holding the lock, then swap the result in"""
+        start = time.monotonic()
+        partition = None
+        try:
+            partition = index.partition(vectors, n)
+        except Exception as e:
+            logger.warning(f"Could not re-cluster the semantic index: {e}")
+        finally:
+            with self._lock:
+                index.finish_training(partition, n)
+        if partition is not None:
+            logger.info(f"Re-clustered {n} semantic cache entries in {time.monotonic() - start:.2f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'embedder': self._embedder.name if self._embedder else None,
+                'entries': len(self._index) if self._index is not None else 0,
+                'lookups': self.lookups,
+                'matches': self.matches,
+                'avg_lookup_ms': round(self._lookup_seconds / self.lookups * 1000, 3) if self.lookups else None
+            }
@@ -0,0 +1,208 @@
+import os
+import time
+import zlib
+import sqlite3
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Answer cache shared by every worker on the host: sqlite, redis or none
+SHARED_CACHE_BACKEND = os.environ.get("SHARED_CACHE_BACKEND", "sqlite").lower()
+SHARED_CACHE_PATH = os.environ.get(
+    "SHARED_CACHE_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "genai-answer-cache.db")
+)
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "redis://localhost:6379/0")
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("SHARED_CACHE_MAX_ENTRIES", 100000))
+
+# Values this size or larger are zlib-compressed; one header byte records which
+COMPRESS_MIN_BYTES = 512
+_RAW = b"r"
+_ZLIB = b"z"
+PURGE_EVERY = 500
+
+
+def encode(answer):
+    """Serialize an answer string to compact bytes"""
+    data = answer.encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return _ZLIB + zlib.compress(data, 6)
+    return _RAW + data
+
+
+def decode(value):
+    data = value[1:]
+    if value[:1] == _ZLIB:
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+class CacheBackend:
+    """Byte-level key/value store with expiry shared between worker processes.
+
+    get returns (value, seconds_left) or None; set stores value for ttl
+    seconds. Implementations may raise; SharedCache treats errors as misses.
+    """
+
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """SQLite database in WAL mode, ideally on tmpfs, with one connection per thread"""
+
+    name = "sqlite"
+
+    def __init__(self, path=SHARED_CACHE_PATH, max_entries=SHARED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS answers_expires ON answers (expires)")
+
+    def _connect(self):
+        # Connections must not cross a fork or be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT value, expires FROM answers WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1] - now
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self._purge(conn)
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def _purge(self, conn):
+        """Drop expired rows, then the soonest-expiring ones beyond max_entries"""
+        conn.execute("DELETE FROM answers WHERE expires <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisBackend(CacheBackend):
+    """Any Redis-protocol server (Redis, Valkey, KeyDB, Dragonfly)"""
+
+    name = "redis"
+    PREFIX = "answer:"
+
+    def __init__(self, url=SHARED_CACHE_URL):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key):
+        pipe = self._client.pipeline()
+        pipe.get(self.PREFIX + key)
+        pipe.pttl(self.PREFIX + key)
+        value, ttl_ms = pipe.execute()
+        if value is None:
+            return None
+        return value, max(ttl_ms, 0) / 1000
+
+    def set(self, key, value, ttl):
+        self._client.set(self.PREFIX + key, value, px=max(int(ttl * 1000), 1))
+
+    def delete(self, key):
+        self._client.delete(self.PREFIX + key)
+
+    def close(self):
+        self._client.close()
+
+
+def load_backend(name=SHARED_CACHE_BACKEND):
+    """Build the configured backend, falling back to no shared tier if it can't start"""
+    try:
+        if name == "sqlite":
+            return SQLiteBackend()
+        if name == "redis":
+            return RedisBackend()
+    except Exception as e:
+        logger.warning(f"Shared cache backend {name} unavailable: {e}")
+        return CacheBackend()
+    if name not in ("none", ""):
+        logger.warning(f"Unknown shared cache backend: {name}")
+    return CacheBackend()
+
+
+class SharedCache:
+    """Answer-level wrapper around a backend: serialization, stats, and errors as misses"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else load_backend()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        """Return (answer, seconds_left) or None"""
+        try:
+            found = self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache read failed: {e}")
+            return None
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value, ttl = found
+        return decode(value), ttl
+
+    def set(self, key, answer, ttl):
+        try:
+            self.backend.set(key, encode(answer), ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors
+        }
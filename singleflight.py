@@ -0,0 +1,224 @@
+import os
+import time
+import json
+import fcntl
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Optional cross-worker coalescing through lock files in a shared directory
+SINGLEFLIGHT_DIR = os.environ.get("SINGLEFLIGHT_DIR")
+SINGLEFLIGHT_RESULT_TTL = float(os.environ.get("SINGLEFLIGHT_RESULT_TTL", 5))
+
+# Workers waiting on another worker's call poll its lock, backing off up to the maximum
+LOCK_POLL_INTERVAL = 0.01
+LOCK_POLL_MAX = 0.2
+# Expired results and abandoned lock files are swept once per this many cross-worker calls
+SWEEP_EVERY = 200
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait and receive the same result or error.
+    When a lock directory is configured, leaders in different worker
+    processes on the same host are coalesced as well; results are passed
+    between workers as JSON, and str subclasses listed in result_types
+    come back as the same type.
+    """
+
+    def __init__(self, lock_dir=SINGLEFLIGHT_DIR, result_ttl=SINGLEFLIGHT_RESULT_TTL, result_types=()):
+        self.lock_dir = lock_dir
+        self.result_ttl = result_ttl
+        self.result_types = {cls.__name__: cls for cls in result_types}
+        self.shared = 0
+        self._worker_calls = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, timeout=None):
+        """Run fn() once per in-flight key across threads (and workers).
+
+        Followers wait at most timeout seconds for the leader's result and
+        raise TimeoutError after that.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir:
+                call.result = self._do_across_workers(key, fn, timeout)
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, fn, timeout=None):
+        """Await fn() once per in-flight key on the running event loop"""
+        future = self._async_calls.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+    def _do_across_workers(self, key, fn, timeout=None):
+        """Use a per-key flock so only one worker on the host calls fn()"""
+        path = os.path.join(self.lock_dir, key)
+        self._worker_calls += 1
+        if self._worker_calls % SWEEP_EVERY == 0:
+            self._sweep()
+
+        lock_file = self._lead_or_wait(path + ".lock", key, timeout)
+        if lock_file is None:
+            # Another worker led the call: use its result
+            result = self._read_result(path)
+            if result is not None:
+                self.shared += 1
+                return result
+            logger.debug(f"Single-flight leader left no result for {key}, calling upstream")
+            return fn()
+
+        try:
+            result = fn()
+            self._write_result(path, result)
+            return result
+        finally:
+            _release(lock_file, path + ".lock")
+
+    def _lead_or_wait(self, lock_path, key, timeout):
+        """The locked lock file when this worker leads, or None once another worker's call finished.
+
+        Waiting polls a non-blocking lock so it can give up after timeout
+        seconds. Leaders remove the lock file before unlocking it, so a
+        lock taken on a file that is no longer at lock_path also means the
+        previous call has just finished.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = LOCK_POLL_INTERVAL
+        waited = False
+        while True:
+            lock_file = open(lock_path, "a+")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                wait = delay if deadline is None else min(delay, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError(f"Timed out waiting for in-flight call {key} in another worker")
+                time.sleep(wait)
+                delay = min(delay * 2, LOCK_POLL_MAX)
+                waited = True
+                continue
+            if waited or not _is_current(lock_file, lock_path):
+                _release(lock_file, lock_path)
+                return None
+            return lock_file
+
+    def _read_result(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        result_type = self.result_types.get(data.get("type"))
+        return result_type(data["value"]) if result_type else data["value"]
+
+    def _write_result(self, path, result):
+        result_type = type(result).__name__
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'type': result_type if result_type in self.result_types else None, 'value': result}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not share single-flight result: {str(e)}")
+
+    def _sweep(self):
+        """Delete expired results and lock files no worker holds"""
+        cutoff = time.time() - self.result_ttl
+        try:
+            entries = list(os.scandir(self.lock_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                if not entry.name.endswith(".lock"):
+                    os.unlink(entry.path)
+                    continue
+                lock_file = open(entry.path, "a+")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.close()
+                    continue
+                _release(lock_file, entry.path)
+            except OSError:
+                continue
+
+
+def _is_current(lock_file, lock_path):
+    """True when lock_file is still the file at lock_path"""
+    try:
+        return os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _release(lock_file, lock_path):
+    """Remove a lock file we hold (unless already replaced), then unlock it by closing"""
+    try:
+        if _is_current(lock_file, lock_path):
+            os.unlink(lock_path)
+    except OSError:
+        pass
+    finally:
+        lock_file.close()
@@ -0,0 +1,108 @@
+import sys
+
+from answer_cache import AnswerCache, ENTRY_OVERHEAD
+
+
+def _size(key, answer):
+    return sys.getsizeof(key) + sys.getsizeof(answer) + ENTRY_OVERHEAD
+
+
+def _cache(max_bytes=20000, **kwargs):
+    kwargs.setdefault('early_beta', 0)
+    return AnswerCache(max_bytes=max_bytes, **kwargs)
+
+
+def test_bytes_are_the_sum_of_entry_sizes():
+    cache = _cache()
+    answers = {f"question {i}": "answer " * (i + 1) for i in range(5)}
+    for key, answer in answers.items():
+        cache.set(key, answer)
+        cache.get(key)
+
+    stats = cache.stats()
+    assert stats['entries'] == 5
+    assert stats['bytes'] == sum(_size(key, answer) for key, answer in answers.items())
+
+
+def test_overwriting_a_key_does_not_double_count():
+    cache = _cache()
+    cache.set("question", "short")
+    cache.set("question", "a much longer answer than before")
+
+    assert cache.get("question") == "a much longer answer than before"
+    stats = cache.stats()
+    assert stats['entries'] == 1
+    assert stats['bytes'] == _size("question", "a much longer answer than before")
+
+
+def test_bytes_stay_within_budget():
+    cache = _cache(max_bytes=5000)
+    for i in range(200):
+        key = f"question {i}"
+        cache.set(key, "answer " * (i % 7 + 1))
+        cache.get(key)
+        assert cache.stats()['bytes'] <= cache.max_bytes
+
+    stats = cache.stats()
+    assert stats['evictions'] + stats['rejections'] > 0
+
+
+def test_oversized_answer_is_rejected():
+    cache = _cache(max_bytes=2000)
+    cache.set("question", "x" * 5000)
+
+    assert cache.get("question") is None
+    stats = cache.stats()
+    assert stats['rejections'] == 1
+    assert stats['bytes'] == 0
+
+
+def test_popular_answers_survive_a_burst_of_one_offs():
+    cache = _cache(max_bytes=10000)
+    popular = [f"popular {i}" for i in range(10)]
+    for key in popular:
+        cache.set(key, "a popular answer")
+    for _ in range(5):
+        for key in popular:
+            assert cache.get(key) == "a popular answer"
+
+    for i in range(500):
+        cache.set(f"one-off {i}", "a one-off answer")
+
+    assert all(cache.get(key) == "a popular answer" for key in popular)
+    assert cache.stats()['rejections'] > 0
+
+
+def test_expired_answer_is_served_stale_within_grace():
+    cache = _cache(grace=60)
+    cache.set("question", "answer", ttl=0)
+
+    assert cache.lookup("question") == ("answer", True)
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_answer_past_grace_is_dropped():
+    cache = _cache(grace=60)
+    cache.set("question", "answer", ttl=-120)
+
+    assert cache.lookup("question") == (None, False)
+    stats = cache.stats()
+    assert stats['entries'] == 0
+    assert stats['bytes'] == 0
+
+
+def test_fresh_answer_is_not_stale_without_early_refresh():
+    cache = _cache()
+    cache.set("question", "answer", ttl=60)
+
+    assert cache.lookup("question") == ("answer", False)
+
+
+def test_only_one_caller_claims_a_refresh():
+    cache = _cache(grace=60)
+    cache.set("question", "answer", ttl=0)
+
+    assert cache.claim_refresh("question")
+    assert not cache.claim_refresh("question")
+    assert not cache.claim_refresh("unknown question")
+    assert cache.stats()['refreshes'] == 1
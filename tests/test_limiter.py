@@ -0,0 +1,141 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from limiter import AdaptiveLimiter, LimitExceeded
+
+
+def _limiter(limit=2, queue_size=1):
+    # A fixed limit keeps the tests independent of the adaptation
+    return AdaptiveLimiter(initial=limit, min_limit=limit, max_limit=limit, queue_size=queue_size)
+
+
+def _wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_admits_up_to_the_limit():
+    limiter = _limiter(limit=2)
+    slots = [limiter.acquire(1), limiter.acquire(1)]
+    assert limiter.inflight == 2
+    for slot in slots:
+        limiter.release(slot)
+    assert limiter.inflight == 0
+
+
+def test_sheds_immediately_when_the_queue_is_full():
+    limiter = _limiter(limit=1, queue_size=0)
+    slot = limiter.acquire(1)
+    assert limiter.saturated()
+
+    start = time.monotonic()
+    with pytest.raises(LimitExceeded) as error:
+        limiter.acquire(5)
+    assert time.monotonic() - start < 0.5
+    assert error.value.retry_after >= 1
+    assert limiter.shed == 1
+
+    limiter.release(slot)
+    assert not limiter.saturated()
+
+
+def test_queued_caller_is_admitted_when_a_slot_frees():
+    limiter = _limiter(limit=1, queue_size=1)
+    slot = limiter.acquire(1)
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(limiter.acquire(2)))
+    waiter.start()
+    _wait_until(lambda: limiter.waiting == 1)
+    assert limiter.saturated()
+
+    limiter.release(slot)
+    waiter.join(2)
+    assert len(admitted) == 1
+    assert limiter.inflight == 1
+    assert limiter.waiting == 0
+
+
+def test_queued_caller_is_shed_after_its_timeout():
+    limiter = _limiter(limit=1, queue_size=1)
+    limiter.acquire(1)
+    start = time.monotonic()
+    with pytest.raises(LimitExceeded):
+        limiter.acquire(0.1)
+    assert 0.05 < time.monotonic() - start < 1
+    assert limiter.waiting == 0
+    assert limiter.shed == 1
+
+
+def test_retry_after_grows_with_the_backlog():
+    limiter = _limiter(limit=1, queue_size=0)
+    slot = limiter.acquire(1)
+    slot.latency = 3.0
+    limiter.release(slot)
+    limiter.acquire(1)
+    with pytest.raises(LimitExceeded) as error:
+        limiter.acquire(1)
+    assert error.value.retry_after == 3
+
+
+def test_reject_counts_as_shed():
+    limiter = _limiter()
+    with pytest.raises(LimitExceeded) as error:
+        limiter.reject("queue full")
+    assert str(error.value) == "queue full"
+    assert error.value.retry_after >= 1
+    assert limiter.shed == 1
+
+
+def test_async_waiter_is_woken_by_release():
+    limiter = _limiter(limit=1, queue_size=1)
+
+    async def main():
+        slot = await limiter.aacquire(1)
+        waiter = asyncio.ensure_future(limiter.aacquire(2))
+        await asyncio.sleep(0.05)
+        assert limiter.waiting == 1
+        # Released from another thread, as a worker thread finishing a call would
+        threading.Thread(target=limiter.release, args=(slot,)).start()
+        return await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(main())
+    assert limiter.inflight == 1
+    assert limiter.waiting == 0
+
+
+def test_async_sheds_when_queue_is_full_and_after_timeout():
+    limiter = _limiter(limit=1, queue_size=1)
+
+    async def main():
+        await limiter.aacquire(1)
+        waiter = asyncio.ensure_future(limiter.aacquire(0.1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LimitExceeded):
+            await limiter.aacquire(1)
+        with pytest.raises(LimitExceeded):
+            await waiter
+
+    asyncio.run(main())
+    assert limiter.shed == 2
+    assert limiter.waiting == 0
+
+
+def test_limit_backs_off_on_drops_and_rising_latency():
+    limiter = AdaptiveLimiter(initial=20, min_limit=2, max_limit=100, queue_size=0, smoothing=1.0)
+    slot = limiter.acquire(1)
+    slot.dropped = True
+    limiter.release(slot)
+    assert limiter.limit == pytest.approx(18)
+
+    for latency in (0.1, 1.0):
+        slot = limiter.acquire(1)
+        slot.latency = latency
+        limiter.release(slot)
+    # Latency ten times the best seen halves the limit (plus the sqrt growth term)
+    assert limiter.limit < 18 * 0.5 + 18 ** 0.5 + 0.01
+    assert limiter.limit >= limiter.min_limit
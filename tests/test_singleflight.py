@@ -0,0 +1,186 @@
+import os
+import asyncio
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Answer(str):
+    pass
+
+
+def _start(target, *args):
+    results = []
+
+    def run():
+        try:
+            results.append(target(*args))
+        except BaseException as e:
+            results.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, results
+
+
+def _wait_until(predicate, timeout=2.0):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        event.wait(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight(lock_dir=None)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "answer"
+
+    leader, leader_result = _start(flight.do, "key", fn)
+    _wait_until(lambda: calls)
+    followers = [_start(flight.do, "key", lambda: "not me", 2) for _ in range(3)]
+    _wait_until(lambda: flight.shared == 3)
+    release.set()
+    for thread, _ in [(leader, None)] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert leader_result == ["answer"]
+    assert [result for _, result in followers] == [["answer"]] * 3
+
+
+def test_followers_receive_the_leaders_error():
+    flight = SingleFlight(lock_dir=None)
+    release = threading.Event()
+
+    def fn():
+        release.wait(2)
+        raise ValueError("upstream failed")
+
+    leader, leader_result = _start(flight.do, "key", fn)
+    _wait_until(lambda: "key" in flight._calls)
+    follower, follower_result = _start(flight.do, "key", lambda: "not me", 2)
+    _wait_until(lambda: flight.shared == 1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert isinstance(leader_result[0], ValueError)
+    assert follower_result[0] is leader_result[0]
+
+
+def test_follower_times_out_and_key_is_freed():
+    flight = SingleFlight(lock_dir=None)
+    release = threading.Event()
+    leader, _ = _start(flight.do, "key", lambda: release.wait(2) and "answer")
+    _wait_until(lambda: "key" in flight._calls)
+
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "not me", timeout=0.05)
+
+    release.set()
+    leader.join()
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_async_followers_share_the_leaders_result():
+    flight = SingleFlight(lock_dir=None)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", fn) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["answer"] * 4
+    assert len(calls) == 1
+    assert flight.shared == 3
+
+
+def test_async_follower_times_out():
+    flight = SingleFlight(lock_dir=None)
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.ado("key", slow, timeout=0.05)
+        return await leader
+
+    assert asyncio.run(main()) == "answer"
+
+
+def test_cross_worker_follower_gets_typed_result_and_files_are_removed(tmp_path):
+    # flock() locks belong to open files, so two instances coalesce like two workers
+    leader_flight = SingleFlight(lock_dir=str(tmp_path), result_types=(Answer,))
+    follower_flight = SingleFlight(lock_dir=str(tmp_path), result_types=(Answer,))
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return Answer("answer")
+
+    leader, leader_result = _start(leader_flight.do, "key", fn)
+    _wait_until(lambda: calls)
+    follower, follower_result = _start(follower_flight.do, "key", fn, 2)
+    # Let the follower find the lock taken before the leader finishes
+    threading.Event().wait(0.2)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(calls) == 1
+    assert follower_result == ["answer"]
+    assert type(follower_result[0]) is Answer
+    assert follower_flight.shared == 1
+    # Only the short-lived result file remains for late followers
+    assert sorted(os.listdir(tmp_path)) == ["key"]
+
+
+def test_cross_worker_follower_honors_timeout(tmp_path):
+    leader_flight = SingleFlight(lock_dir=str(tmp_path))
+    follower_flight = SingleFlight(lock_dir=str(tmp_path))
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return "answer"
+
+    leader, _ = _start(leader_flight.do, "key", fn)
+    _wait_until(lambda: calls)
+    try:
+        with pytest.raises(TimeoutError):
+            follower_flight.do("key", fn, timeout=0.1)
+    finally:
+        release.set()
+        leader.join()
+    assert len(calls) == 1
+
+
+def test_sweep_removes_expired_results_and_abandoned_locks(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path), result_ttl=0)
+    assert flight.do("first", lambda: "answer") == "answer"
+    (tmp_path / "abandoned.lock").touch()
+
+    flight._sweep()
+
+    assert os.listdir(tmp_path) == []
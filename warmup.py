@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Warm-up and keep-warm schedule
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_GATE_HEALTH = os.environ.get("WARMUP_GATE_HEALTH", "true").lower() in ("1", "true", "yes")
+KEEP_WARM_INTERVAL = float(os.environ.get("KEEP_WARM_INTERVAL", 300))
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", 60))
+WARMUP_RETRY_SECONDS = 10.0
+
+
+class ModelWarmer:
+    """Keep upstream models loaded and track per-model readiness.
+
+    warm_fn(model_id) sends a cheap inference and returns True once the
+    model answered without a cold load. A background thread warms every
+    model at start-up and again whenever it has seen no successful traffic
+    for interval seconds. attempted() turns true once the first round has
+    finished, whether or not every model came up.
+    """
+
+    def __init__(self, warm_fn, models, interval=KEEP_WARM_INTERVAL, enabled=WARMUP_ENABLED):
+        self.warm_fn = warm_fn
+        self.models = list(models)
+        self.interval = interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._status = {model: {'ready': False, 'last_success': None, 'last_error': None, 'warmups': 0}
+                        for model in self.models}
+        self._thread = None
+        self._thread_pid = None
+        self._stop = threading.Event()
+        self._attempted = threading.Event()
+
+    def ensure_started(self):
+        """Start the warm-up thread in this process (threads don't survive fork)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for model in self.models:
+                if self._due(model):
+                    self.warm(model)
+            self._attempted.set()
+            # Retry cold models sooner than the keep-warm interval
+            wait = self.interval if self.all_ready() else min(self.interval, WARMUP_RETRY_SECONDS)
+            self._stop.wait(wait)
+
+    def _due(self, model):
+        with self._lock:
+            last_success = self._status[model]['last_success']
+        return last_success is None or time.time() - last_success >= self.interval
+
+    def warm(self, model):
+        """Send one warm-up inference to a model and record the outcome"""
+        start = time.monotonic()
+        try:
+            ready = bool(self.warm_fn(model))
+            error = None if ready else "model not ready"
+        except Exception as e:
+            ready = False
+            error = str(e)
+        with self._lock:
+            status = self._status.setdefault(model, {'ready': False, 'last_success': None, 'last_error': None, 'warmups': 0})
+            status['warmups'] += 1
+            status['ready'] = ready
+            status['last_error'] = error
+            status['warmup_ms'] = round((time.monotonic() - start) * 1000, 1)
+            if ready:
+                status['last_success'] = time.time()
+        if ready:
+            logger.info(f"Model {model} warmed up")
+        else:
+            logger.warning(f"Model {model} warm-up failed: {error}")
+        return ready
+
+    def touch(self, model):
+        """Record successful real traffic, which keeps the model warm"""
+        with self._lock:
+            status = self._status.get(model)
+            if status is not None:
+                status['ready'] = True
+                status['last_success'] = time.time()
+
+    def mark_cold(self, model):
+        """Record that upstream reported the model as loading"""
+        with self._lock:
+            status = self._status.get(model)
+            if status is not None:
+                status['ready'] = False
+
+    def is_ready(self, model):
+        if not self.enabled:
+            return True
+        with self._lock:
+            return self._status.get(model, {}).get('ready', False)
+
+    def all_ready(self):
+        return all(self.is_ready(model) for model in self.models)
+
+    def attempted(self):
+        """True once every model has had its start-up warm-up (or warm-up is off)"""
+        return not self.enabled or self._attempted.is_set()
+
+    def snapshot(self):
+        """Per-model readiness for the health endpoint"""
+        with self._lock:
+            return {
+                model: {
+                    'ready': status['ready'] or not self.enabled,
+                    'last_success_age_s': round(time.time() - status['last_success'], 1) if status['last_success'] else None,
+                    'last_error': status['last_error'],
+                    'warmups': status['warmups']
+                }
+                for model, status in self._status.items()
+            }